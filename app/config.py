@@ -1,4 +1,5 @@
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -15,6 +16,124 @@ class Config:
     QDRANT_API_KEY = os.getenv('QDRANT_API_KEY')
     QDRANT_COLLECTION_NAME = os.getenv('QDRANT_COLLECTION_NAME')
 
+    # Backend de vectores: 'qdrant' (remoto) o 'local' (índice NumPy en proceso
+    # con instantánea en LOCAL_INDEX_PATH)
+    VECTOR_BACKEND = os.getenv('VECTOR_BACKEND', 'qdrant')
+    LOCAL_INDEX_PATH = os.getenv('LOCAL_INDEX_PATH', './app/data/cache/vector_index')
+
+    # Recuperación: 'hybrid' combina BM25 y vectores por rango recíproco (RRF),
+    # 'dense' usa solo la búsqueda vectorial
+    RETRIEVAL_MODE = os.getenv('RETRIEVAL_MODE', 'hybrid')
+    HYBRID_CANDIDATES = int(os.getenv('HYBRID_CANDIDATES', '20'))
+    RRF_K = int(os.getenv('RRF_K', '60'))
+
+    # Sincronización del índice: 'incremental' solo embebe fragmentos nuevos o
+    # modificados y elimina los obsoletos; 'rebuild' borra y recarga la colección
+    INDEX_SYNC_MODE = os.getenv('INDEX_SYNC_MODE', 'incremental')
+
+    # Varios workers: lock que serializa la sincronización del índice, marcador
+    # con la versión indexada y espera máxima por el lock en segundos
+    INDEX_LOCK_PATH = os.getenv('INDEX_LOCK_PATH', './app/data/cache/index.lock')
+    INDEX_VERSION_PATH = os.getenv('INDEX_VERSION_PATH', './app/data/cache/index_version.json')
+    INDEX_LOCK_TIMEOUT = float(os.getenv('INDEX_LOCK_TIMEOUT', '1800'))
+    # Identificador del despliegue (p. ej. el commit): con INDEX_SYNC_MODE=rebuild
+    # la colección se borra una vez por cada valor, y al cambiar se vuelve a
+    # sincronizar aunque los datos sean los mismos. Sin él se usa el inicio del
+    # proceso maestro, que solo comparten los workers de gunicorn con preload_app
+    INDEX_DEPLOY_ID = os.getenv('INDEX_DEPLOY_ID', '')
+    STARTED_AT = float(os.environ.setdefault('MINDTEC_STARTED_AT', str(time.time())))
+    # Carga el modelo de embeddings al importar la app (gunicorn --preload), para
+    # que los workers compartan los pesos con copia en escritura
+    PRELOAD_MODEL = os.getenv('PRELOAD_MODEL', 'false').lower() == 'true'
+
+    # Modelo de embeddings y caché persistente de vectores (vacío para desactivarla)
+    EMBEDDING_MODEL_NAME = os.getenv('EMBEDDING_MODEL_NAME', 'sentence-transformers/all-mpnet-base-v2')
+    # Backend del modelo: 'torch' (fp32), 'onnx' u 'onnx-int8' (cuantizado, más
+    # rápido en CPU); hilos del encoder (0 = valor por defecto de la librería)
+    EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')
+    EMBEDDING_THREADS = int(os.getenv('EMBEDDING_THREADS', '0'))
+    EMBEDDING_ONNX_FILE = os.getenv('EMBEDDING_ONNX_FILE', '')
+    EMBEDDING_CACHE_DIR = os.getenv('EMBEDDING_CACHE_DIR', './app/data/cache/embeddings')
+    EMBEDDING_CACHE_DTYPE = os.getenv('EMBEDDING_CACHE_DTYPE', 'float16')
+    # Vectores máximos en disco antes de compactar y consultas en el LRU en memoria
+    EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', '100000'))
+    QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', '1000'))
+
+    # Caché de respuestas: entradas máximas (0 la desactiva), TTL en segundos y
+    # similitud coseno mínima para reutilizar la respuesta de una pregunta parecida
+    ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', '1000'))
+    ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', '3600'))
+    ANSWER_CACHE_SIMILARITY = float(os.getenv('ANSWER_CACHE_SIMILARITY', '0.95'))
+
+    # Procesamiento asíncrono del webhook: workers y mensajes pendientes por worker
+    MESSAGE_WORKERS = int(os.getenv('MESSAGE_WORKERS', '4'))
+    MESSAGE_QUEUE_SIZE = int(os.getenv('MESSAGE_QUEUE_SIZE', '100'))
+
+    # Historial de conversación: 'memory' o 'sqlite' (persistente y compartido
+    # entre workers), con límites de turnos por usuario, usuarios e inactividad
+    HISTORY_BACKEND = os.getenv('HISTORY_BACKEND', 'memory')
+    HISTORY_DB_PATH = os.getenv('HISTORY_DB_PATH', './app/data/cache/history.sqlite3')
+    HISTORY_MAX_TURNS = int(os.getenv('HISTORY_MAX_TURNS', '20'))
+    HISTORY_MAX_USERS = int(os.getenv('HISTORY_MAX_USERS', '10000'))
+    HISTORY_IDLE_TTL = int(os.getenv('HISTORY_IDLE_TTL', '86400'))
+    HISTORY_RECENT_TURNS = int(os.getenv('HISTORY_RECENT_TURNS', '4'))
+
+    # Agrupa preguntas idénticas simultáneas (misma pregunta normalizada) en una
+    # sola búsqueda y llamada al LLM
+    SINGLE_FLIGHT = os.getenv('SINGLE_FLIGHT', 'true').lower() == 'true'
+    # Espera máxima (segundos) por la respuesta compartida antes de calcularla aparte
+    SINGLE_FLIGHT_TIMEOUT = float(os.getenv('SINGLE_FLIGHT_TIMEOUT', '60'))
+
+    # Enrutador de intenciones por centroides de embeddings. Con similitud de al
+    # menos INTENT_FAST_PATH_THRESHOLD (y ventaja INTENT_MIN_MARGIN sobre la
+    # segunda intención) las preguntas de listado se responden con las filas de
+    # los CSV sin llamar al LLM; desde INTENT_ROUTE_THRESHOLD solo se filtra la
+    # búsqueda por el tipo de documento de la intención. Sin un lugar, deporte,
+    # organización o empresa mencionado, solo los pedidos de listado explícitos
+    # se responden sin LLM
+    INTENT_ROUTER = os.getenv('INTENT_ROUTER', 'true').lower() == 'true'
+    INTENT_FAST_PATH = os.getenv('INTENT_FAST_PATH', 'true').lower() == 'true'
+    INTENT_FAST_PATH_THRESHOLD = float(os.getenv('INTENT_FAST_PATH_THRESHOLD', '0.6'))
+    INTENT_MIN_MARGIN = float(os.getenv('INTENT_MIN_MARGIN', '0.05'))
+    INTENT_ROUTE_THRESHOLD = float(os.getenv('INTENT_ROUTE_THRESHOLD', '0.45'))
+    INTENT_FAST_PATH_MAX_ITEMS = int(os.getenv('INTENT_FAST_PATH_MAX_ITEMS', '15'))
+
+    # Micro-lotes de embeddings de consultas: espera máxima en ms (0 los desactiva)
+    # y tamaño máximo del lote
+    EMBED_QUERY_MAX_WAIT_MS = float(os.getenv('EMBED_QUERY_MAX_WAIT_MS', '5'))
+    EMBED_QUERY_BATCH_SIZE = int(os.getenv('EMBED_QUERY_BATCH_SIZE', '32'))
+
+    # Consultas de prueba al arrancar: 'retrieval' (solo búsqueda, sin LLM),
+    # 'full' (respuesta completa con el LLM) u 'off'
+    SELF_TEST_MODE = os.getenv('SELF_TEST_MODE', 'retrieval')
+
+    # Trazas de mensajes lentos: umbral en segundos (0 lo desactiva) y fracción
+    # de mensajes lentos cuya traza completa se registra en el log
+    SLOW_REQUEST_SECONDS = float(os.getenv('SLOW_REQUEST_SECONDS', '10'))
+    SLOW_TRACE_SAMPLE_RATE = float(os.getenv('SLOW_TRACE_SAMPLE_RATE', '1.0'))
+
+    # Contexto del prompt: tokens máximos, fragmentos recuperados, similitud
+    # mínima de los resultados densos y codificación usada para contar tokens.
+    # Una fila de sílabo ocupa ~1.1-1.3K tokens: el límite por defecto admite
+    # CONTEXT_MAX_CHUNKS filas completas y solo recorta casos excepcionales
+    CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '7000'))
+    CONTEXT_MAX_CHUNKS = int(os.getenv('CONTEXT_MAX_CHUNKS', '5'))
+    CONTEXT_MIN_SCORE = float(os.getenv('CONTEXT_MIN_SCORE', '0.2'))
+    TOKENIZER_ENCODING = os.getenv('TOKENIZER_ENCODING', 'o200k_base')
+
+    # Respuestas en streaming: cada sección se envía como un mensaje de WhatsApp
+    # en cuanto el LLM la termina. Una sección se cierra en un salto de párrafo
+    # con al menos STREAM_MIN_SECTION_CHARS caracteres; ningún mensaje supera
+    # WHATSAPP_MAX_CHARS (límite de Twilio)
+    STREAM_RESPONSES = os.getenv('STREAM_RESPONSES', 'true').lower() == 'true'
+    STREAM_MIN_SECTION_CHARS = int(os.getenv('STREAM_MIN_SECTION_CHARS', '300'))
+    WHATSAPP_MAX_CHARS = int(os.getenv('WHATSAPP_MAX_CHARS', '1600'))
+
+    # Carga masiva: tamaño de lote del encoder y de cada upsert a Qdrant
+    EMBED_BATCH_SIZE = int(os.getenv('EMBED_BATCH_SIZE', '64'))
+    UPSERT_BATCH_SIZE = int(os.getenv('UPSERT_BATCH_SIZE', '256'))
+    UPSERT_MAX_RETRIES = int(os.getenv('UPSERT_MAX_RETRIES', '3'))
+
 config = Config()
 
 
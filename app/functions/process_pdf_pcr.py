@@ -1,52 +1,107 @@
 import os
 import re
 import csv
+import json
+import hashlib
 import logging
-from typing import List, Dict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, Optional
 from pdfminer.high_level import extract_text
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+FIELDNAMES = ['Archivo', 'Carrera', 'Curso', 'Malla', 'Modalidad', 'Creditos', 
+              'Objetivos', 'Competencias', 'Resultados de Aprendizaje', 
+              'Temas', 'Sistema de Evaluación', 'Referencias Bibliográficas']
+
+# Patrones compilados una sola vez por proceso
+CLEAN_PUNCTUATION = re.compile(r'[.\n]+')
+CLEAN_WHITESPACE = re.compile(r'\s+')
+
+FIELD_FLAGS = re.IGNORECASE | re.DOTALL
+CAMPOS = [
+    ("Carrera", re.compile(r"(?:CARRERA|DEPARTAMENTO|DIRECCIÓN)\s*:?\s*(.*?)(?:\n|$)", FIELD_FLAGS)),
+    ("Curso", re.compile(r"(?:CURSO|ASIGNATURA)\s*:?\s*(.*?)(?:\n|$)", FIELD_FLAGS)),
+    ("Malla", re.compile(r"(?:MALLA|AÑO)\s*:?\s*(.*?)(?:\n|$)", FIELD_FLAGS)),
+    ("Modalidad", re.compile(r"(?:MODALIDAD|2\.7\s*Modalidad:)\s*:?\s*(.*?)(?:\n|$)", FIELD_FLAGS)),
+    ("Creditos", re.compile(r"(?:CREDITOS|CRÉDITOS|2\.2\s*Créditos:)\s*:?\s*(.*?)(?:\n|$)", FIELD_FLAGS)),
+]
+OBJETIVOS_SESION = re.compile(r"(?:Sesión|Objetivo)\s*\d*\s*:?\s*(.*?)(?:\n|$)")
+SECCIONES = [
+    ("Objetivos", re.compile(r"(?:OBJETIVOS|4\.\s*OBJETIVOS)(.*?)(?:\d+\.\s*COMPETENCIAS|\Z)", FIELD_FLAGS)),
+    ("Competencias", re.compile(r"(?:COMPETENCIAS[^:]*:|5\.\s*COMPETENCIAS)(.*?)(?:\d+\.\s*RESULTADOS|\Z)", FIELD_FLAGS)),
+    ("Resultados de Aprendizaje", re.compile(r"(?:RESULTADOS DE APRENDIZAJE|6\.\s*RESULTADOS)(.*?)(?:\d+\.\s*TEMAS|\Z)", FIELD_FLAGS)),
+    ("Temas", re.compile(r"(?:TEMAS|7\.\s*TEMAS)(.*?)(?:\d+\.\s*PLAN|\Z)", FIELD_FLAGS)),
+    ("Sistema de Evaluación", re.compile(r"(?:SISTEMA DE EVALUACIÓN|9\.\s*SISTEMA)(.*?)(?:\d+\.\s*REFERENCIAS|\Z)", FIELD_FLAGS)),
+    ("Referencias Bibliográficas", re.compile(r"(?:REFERENCIAS BIBLIOGRÁFICAS|10\.\s*REFERENCIAS)(.*?)(?:\Z)", FIELD_FLAGS)),
+]
+
+def fileHash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+MANIFEST_FIELDS = ('size', 'mtime', 'sha256')
+
+class ExistingRows:
+    # Filas del CSV anterior, leídas a demanda por nombre de archivo. El CSV se
+    # escribe en el mismo orden en que se recorren los PDFs, así que normalmente
+    # la fila buscada es la siguiente y no se acumula ninguna en memoria.
+    def __init__(self, csv_path: str):
+        self.buffer = {}
+        self.file = open(csv_path, 'r', newline='', encoding='utf-8') if os.path.exists(csv_path) else None
+        self.reader = csv.DictReader(self.file) if self.file else iter(())
+
+    def get(self, archivo: str) -> Optional[Dict[str, str]]:
+        if archivo in self.buffer:
+            return self.buffer.pop(archivo)
+        for row in self.reader:
+            if row.get('Archivo') == archivo:
+                return row
+            self.buffer[row.get('Archivo')] = row
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.file:
+            self.file.close()
+
 class SilaboExtractor:
-    def __init__(self, pdf_directory: str, output_file: str):
+    def __init__(self, pdf_directory: str, output_file: str, max_workers: Optional[int] = None, manifest_file: Optional[str] = None):
         self.pdf_directory = pdf_directory
         self.output_file = output_file
+        self.max_workers = max_workers
+        self.manifest_file = manifest_file or f"{output_file}.manifest.json"
 
     def clean_text(self, text: str) -> str:
-        text = re.sub(r'[.\n]+', ' ', text)
-        text = re.sub(r'\s+', ' ', text)
+        text = CLEAN_PUNCTUATION.sub(' ', text)
+        text = CLEAN_WHITESPACE.sub(' ', text)
         return text.strip()
 
-    def extract_field(self, text: str, pattern: str) -> str:
-        match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+    def extract_field(self, text: str, pattern: re.Pattern) -> str:
+        match = pattern.search(text)
         if match:
             return self.clean_text(match.group(1))
         else:
-            logging.warning(f"No se encontró coincidencia para el patrón '{pattern}'")
+            logging.warning(f"No se encontró coincidencia para el patrón '{pattern.pattern}'")
             return "No encontrado"
 
     def extract_info(self, text: str) -> Dict[str, str]:
         info = {}
 
-        campos = [
-            ("Carrera", r"(?:CARRERA|DEPARTAMENTO|DIRECCIÓN)\s*:?\s*(.*?)(?:\n|$)"),
-            ("Curso", r"(?:CURSO|ASIGNATURA)\s*:?\s*(.*?)(?:\n|$)"),
-            ("Malla", r"(?:MALLA|AÑO)\s*:?\s*(.*?)(?:\n|$)"),
-            ("Modalidad", r"(?:MODALIDAD|2\.7\s*Modalidad:)\s*:?\s*(.*?)(?:\n|$)"),
-            ("Creditos", r"(?:CREDITOS|CRÉDITOS|2\.2\s*Créditos:)\s*:?\s*(.*?)(?:\n|$)"),
-        ]
-
-        for nombre, patron in campos:
+        for nombre, patron in CAMPOS:
             info[nombre] = self.extract_field(text, patron)
 
-        objetivos = re.findall(r"(?:Sesión|Objetivo)\s*\d*\s*:?\s*(.*?)(?:\n|$)", text)
-        info['Objetivos'] = '; '.join(objetivos) if objetivos else self.extract_field(text, r"(?:OBJETIVOS|4\.\s*OBJETIVOS)(.*?)(?:\d+\.\s*COMPETENCIAS|\Z)")
-
-        info['Competencias'] = self.extract_field(text, r"(?:COMPETENCIAS[^:]*:|5\.\s*COMPETENCIAS)(.*?)(?:\d+\.\s*RESULTADOS|\Z)")
-        info['Resultados de Aprendizaje'] = self.extract_field(text, r"(?:RESULTADOS DE APRENDIZAJE|6\.\s*RESULTADOS)(.*?)(?:\d+\.\s*TEMAS|\Z)")
-        info['Temas'] = self.extract_field(text, r"(?:TEMAS|7\.\s*TEMAS)(.*?)(?:\d+\.\s*PLAN|\Z)")
-        info['Sistema de Evaluación'] = self.extract_field(text, r"(?:SISTEMA DE EVALUACIÓN|9\.\s*SISTEMA)(.*?)(?:\d+\.\s*REFERENCIAS|\Z)")
-        info['Referencias Bibliográficas'] = self.extract_field(text, r"(?:REFERENCIAS BIBLIOGRÁFICAS|10\.\s*REFERENCIAS)(.*?)(?:\Z)")
+        objetivos = OBJETIVOS_SESION.findall(text)
+        for nombre, patron in SECCIONES:
+            if nombre == 'Objetivos' and objetivos:
+                info[nombre] = '; '.join(objetivos)
+            else:
+                info[nombre] = self.extract_field(text, patron)
 
         return info
 
@@ -58,39 +113,101 @@ class SilaboExtractor:
             logging.error(f"Error procesando {pdf_path}: {e}")
             return {}
 
-    def process_directory(self) -> List[Dict[str, str]]:
-        results = []
-        for filename in os.listdir(self.pdf_directory):
-            if filename.endswith('.pdf'):
-                pdf_path = os.path.join(self.pdf_directory, filename)
-                logging.info(f"Procesando: {pdf_path}")
-                result = self.process_pdf(pdf_path)
-                if result:
-                    result['Archivo'] = filename
-                    results.append(result)
-        return results
-
-    def save_to_csv(self, data: List[Dict[str, str]]):
-        if not data:
-            logging.warning("No hay datos para guardar en el CSV")
-            return
-
-        fieldnames = ['Archivo', 'Carrera', 'Curso', 'Malla', 'Modalidad', 'Creditos', 
-                      'Objetivos', 'Competencias', 'Resultados de Aprendizaje', 
-                      'Temas', 'Sistema de Evaluación', 'Referencias Bibliográficas']
+    def load_manifest(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.manifest_file):
+            return {}
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Manifiesto {self.manifest_file} ilegible, se reprocesarán todos los PDFs: {e}")
+            return {}
 
-        with open(self.output_file, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+    def save_manifest(self, manifest: Dict[str, Dict]):
+        tmp_file = f"{self.manifest_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_file, self.manifest_file)
+
+    def process_directory(self) -> Iterator[Dict[str, str]]:
+        # Un PDF sin cambios (mismo tamaño y mtime, o mismo hash de contenido)
+        # reutiliza su fila del CSV anterior; el resto se extrae en paralelo. Las
+        # filas se entregan en orden de nombre de archivo, así el CSV es estable
+        # entre ejecuciones. El manifiesto solo guarda tamaño, mtime y hash.
+        manifest = self.load_manifest()
+        updated_manifest = {}
+        files = []
+        pending = {}
+
+        for filename in sorted(os.listdir(self.pdf_directory)):
+            if not filename.endswith('.pdf'):
+                continue
+            pdf_path = os.path.join(self.pdf_directory, filename)
+            stat = os.stat(pdf_path)
+            entry = manifest.get(pdf_path)
+            if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+                updated_manifest[pdf_path] = {field: entry[field] for field in MANIFEST_FIELDS}
+                files.append((pdf_path, True))
+                continue
+
+            content_hash = fileHash(pdf_path)
+            if entry and entry['sha256'] == content_hash:
+                updated_manifest[pdf_path] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': content_hash}
+                files.append((pdf_path, True))
+                continue
+
+            pending[pdf_path] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': content_hash}
+            files.append((pdf_path, False))
+
+        logging.info(f"{len(updated_manifest)} PDFs sin cambios, {len(pending)} por procesar")
+
+        with ExistingRows(self.output_file) as existing, ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            # map entrega los resultados en el orden de envío
+            results = executor.map(self.process_pdf, list(pending))
+            for pdf_path, unchanged in files:
+                archivo = os.path.basename(pdf_path)
+                if unchanged:
+                    row = existing.get(archivo)
+                    if row is None:
+                        logging.warning(f"{archivo} no está en {self.output_file}, se vuelve a procesar")
+                        row = self.process_pdf(pdf_path)
+                else:
+                    row = next(results)
+                    logging.info(f"Procesado: {pdf_path}")
+                    if row:
+                        updated_manifest[pdf_path] = pending[pdf_path]
+
+                if not row:
+                    updated_manifest.pop(pdf_path, None)
+                    continue
+                row['Archivo'] = archivo
+                yield row
+
+        self.save_manifest(updated_manifest)
+
+    def save_to_csv(self, data: Iterable[Dict[str, str]]):
+        # Las filas se escriben a medida que llegan en un archivo temporal que
+        # reemplaza al CSV final solo si el proceso termina bien
+        tmp_file = f"{self.output_file}.tmp"
+        written = 0
+        with open(tmp_file, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
             writer.writeheader()
             for row in data:
                 writer.writerow(row)
+                written += 1
+
+        if not written:
+            os.remove(tmp_file)
+            logging.warning("No hay datos para guardar en el CSV")
+            return
 
-        logging.info(f"Datos guardados en {self.output_file}")
+        os.replace(tmp_file, self.output_file)
+        logging.info(f"{written} filas guardadas en {self.output_file}")
 
     def run(self):
         logging.info("Iniciando procesamiento de sílabos")
-        data = self.process_directory()
-        self.save_to_csv(data)
+        self.save_to_csv(self.process_directory())
         logging.info("Proceso finalizado")
 
 if __name__ == "__main__":
@@ -1,10 +1,18 @@
+import asyncio
 import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from xml.sax.saxutils import escape
 from fastapi import FastAPI, Request
-from app.services.twilio_service import sendWhatsappMessage
-from app.services.chatbot_service import ChatbotService
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from app.config import config
+from app.services.twilio_service import sendWhatsappMessageAsync, closeAsyncClient
+from app.services.message_queue import MessageDispatcher
+from app.utils.message_splitter import splitMessage
+from app.utils.metrics import registry, span, trace, STAGE_SECONDS
 from openai import OpenAIError
 
-app = FastAPI()
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
@@ -12,34 +20,200 @@ data_paths = [
     "./app/data/syllabus_extracted.csv",
     "./app/data/promos_clean.csv",
     "./app/data/deportes_clean.csv",
-    "./app/data/organized_organizations.csv"
-    "./app/data/ofertas_empleo_chatbot.csv"
+    "./app/data/organized_organizations.csv",
+    "./app/data/ofertas_empleo_chatbot.csv",
 ]
 
-chatbot_service = ChatbotService(data_paths)
+def preloadModel():
+    # Solo se cargan los pesos, sin inferencia: los pools de hilos de torch y
+    # ONNX Runtime no sobreviven al fork y se crean en cada worker al usarse
+    from app.utils.embedding_backend import createEmbeddings
+    started = time.monotonic()
+    createEmbeddings(
+        config.EMBEDDING_MODEL_NAME,
+        backend=config.EMBEDDING_BACKEND,
+        threads=config.EMBEDDING_THREADS,
+        onnx_file=config.EMBEDDING_ONNX_FILE
+    )
+    logger.info(f"Modelo de embeddings precargado en el proceso maestro en {time.monotonic() - started:.1f}s")
 
-@app.post("/hook")
-async def chat(request: Request):
-    form_data = await request.form()
-    body_data = form_data.get("Body", "")
-    from_phone = form_data.get("From", "")
+if config.PRELOAD_MODEL:
+    preloadModel()
 
-    logger.info(f"Mensaje recibido de {from_phone}: {body_data}")
+# El servicio se construye en segundo plano tras arrancar el servidor: /healthz
+# responde de inmediato y /readyz cuando el índice y el modelo están listos
+chatbot_service = None
+startup_done = asyncio.Event()
+startup_error = None
+
+def buildChatbotService():
+    # Importación diferida: langchain, el modelo y el índice se cargan fuera del arranque
+    from app.services.chatbot_service import ChatbotService
+    started = time.monotonic()
+    service = ChatbotService(data_paths)
+    service.warmup()
+    logger.info(f"Servicio listo en {time.monotonic() - started:.1f}s")
+    return service
+
+async def loadChatbotService():
+    global chatbot_service, startup_error
+    try:
+        chatbot_service = await asyncio.to_thread(buildChatbotService)
+    except Exception as e:
+        startup_error = str(e)
+        logger.error(f"Error al inicializar el servicio: {str(e)}", exc_info=True)
+    finally:
+        startup_done.set()
 
+def isReady():
+    return chatbot_service is not None
+
+async def handleMessage(from_phone, body_data):
+    with trace("message", slow_threshold=config.SLOW_REQUEST_SECONDS, sample_rate=config.SLOW_TRACE_SAMPLE_RATE, phone=from_phone):
+        await processAndReply(from_phone, body_data)
+
+async def processAndReply(from_phone, body_data):
+    # Los mensajes recibidos durante el arranque esperan a que el servicio esté listo
+    await startup_done.wait()
+
+    # Recuperación y LLM son bloqueantes: se ejecutan fuera del event loop
     try:
-        response = chatbot_service.processMessage(from_phone, body_data)
-        logger.debug(f"Respuesta generada: {response}")
-        send_result = sendWhatsappMessage(from_phone, response)
-        return {"status": "success", "message": send_result}
+        if not isReady():
+            raise RuntimeError(f"Servicio no disponible: {startup_error}")
+        started = time.perf_counter()
+        if config.STREAM_RESPONSES:
+            await streamReply(from_phone, body_data, started)
+        else:
+            response = await asyncio.to_thread(chatbot_service.processMessage, from_phone, body_data)
+            logger.debug(f"Respuesta generada: {response}")
+            for i, part in enumerate(splitMessage(response, config.WHATSAPP_MAX_CHARS)):
+                await sendWhatsappMessageAsync(from_phone, part)
+                if i == 0:
+                    STAGE_SECONDS.observe(time.perf_counter() - started, stage="first_message")
 
     except OpenAIError as e:
         logger.error(f"Error de OpenAI: {str(e)}")
         error_message = "📢 Lo siento, estamos experimentando problemas técnicos. Por favor, intenta de nuevo más tarde."
-        sendWhatsappMessage(from_phone, error_message)
-        return {"status": "error", "message": "Error de OpenAI", "details": str(e)}
+        await sendWhatsappMessageAsync(from_phone, error_message)
 
     except Exception as e:
         logger.error(f"Error inesperado al procesar el mensaje: {str(e)}", exc_info=True)
         error_message = "📢 Lo siento, ocurrió un error inesperado. Por favor, intenta de nuevo más tarde."
-        sendWhatsappMessage(from_phone, error_message)
-        return {"status": "error", "message": "Error interno", "details": str(e)}
+        await sendWhatsappMessageAsync(from_phone, error_message)
+
+async def streamReply(from_phone, body_data, started):
+    # La generación corre en un hilo y deja cada sección en una cola; este
+    # worker la envía en cuanto llega, en orden, mientras el LLM sigue generando.
+    # Si un envío falla, stop detiene la generación en la siguiente sección
+    loop = asyncio.get_running_loop()
+    sections = asyncio.Queue()
+    stop = threading.Event()
+
+    def produce():
+        stream = chatbot_service.processMessageStream(from_phone, body_data)
+        try:
+            for section in stream:
+                if stop.is_set():
+                    break
+                loop.call_soon_threadsafe(sections.put_nowait, section)
+        finally:
+            # Cierra el generador (y el stream del LLM) desde el hilo que lo recorre
+            stream.close()
+            loop.call_soon_threadsafe(sections.put_nowait, None)
+
+    producer = asyncio.create_task(asyncio.to_thread(produce))
+    sent = 0
+    try:
+        while (section := await sections.get()) is not None:
+            await sendWhatsappMessageAsync(from_phone, section)
+            if sent == 0:
+                STAGE_SECONDS.observe(time.perf_counter() - started, stage="first_message")
+            sent += 1
+    finally:
+        # La generación termina antes de que se envíe cualquier mensaje de error
+        stop.set()
+        await asyncio.gather(producer, return_exceptions=True)
+    await producer
+    logger.debug(f"Respuesta enviada a {from_phone} en {sent} mensajes")
+
+dispatcher = MessageDispatcher(handleMessage, num_workers=config.MESSAGE_WORKERS, max_queue_size=config.MESSAGE_QUEUE_SIZE)
+
+@asynccontextmanager
+async def lifespan(app):
+    await dispatcher.start()
+    loader = asyncio.create_task(loadChatbotService())
+    yield
+    loader.cancel()
+    startup_done.set()
+    await dispatcher.stop()
+    await closeAsyncClient()
+
+app = FastAPI(lifespan=lifespan)
+
+def notReadyResponse():
+    status = "error" if startup_error else "starting"
+    return JSONResponse(status_code=503, content={"status": status, "details": startup_error})
+
+@app.post("/hook")
+async def chat(request: Request):
+    form_data = await request.form()
+    body_data = form_data.get("Body", "")
+    from_phone = form_data.get("From", "")
+
+    logger.info(f"Mensaje recibido de {from_phone}: {body_data}")
+
+    with span("hook_enqueue"):
+        enqueued = dispatcher.enqueue(from_phone, body_data)
+    if not enqueued:
+        # Se responde con TwiML en la misma petición: Twilio entrega el aviso sin
+        # que el webhook espere una llamada a su API
+        busy_message = "📢 Lo siento, estamos recibiendo muchos mensajes. Por favor, intenta de nuevo en unos minutos."
+        twiml = f'<?xml version="1.0" encoding="UTF-8"?><Response><Message>{escape(busy_message)}</Message></Response>'
+        return Response(content=twiml, media_type="application/xml")
+
+    return {"status": "success", "message": "Mensaje encolado"}
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    if not isReady():
+        return notReadyResponse()
+    return {"status": "ready", "corpus_version": chatbot_service.qa_model.corpus_version}
+
+QUEUE_DEPTH = registry.gauge("mindtec_queue_depth", "Mensajes pendientes en la cola de workers")
+ANSWER_CACHE_ENTRIES = registry.gauge("mindtec_answer_cache_entries", "Respuestas almacenadas en la caché")
+HISTORY_USERS = registry.gauge("mindtec_history_users", "Usuarios con historial de conversación")
+
+@app.get("/metrics")
+async def metrics():
+    QUEUE_DEPTH.set(dispatcher.stats()["queue_depth"])
+    if isReady():
+        if chatbot_service.qa_model.answer_cache:
+            ANSWER_CACHE_ENTRIES.set(chatbot_service.qa_model.answer_cache.stats()["entries"])
+        HISTORY_USERS.set(chatbot_service.chat_history.stats()["users"])
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/queue")
+async def queue_stats():
+    return dispatcher.stats()
+
+@app.get("/history")
+async def history_stats():
+    if not isReady():
+        return notReadyResponse()
+    return chatbot_service.chat_history.stats()
+
+@app.get("/embeddings")
+async def embedding_stats():
+    if not isReady():
+        return notReadyResponse()
+    return chatbot_service.qa_model.embedding_stats()
+
+@app.get("/intents")
+async def intent_stats():
+    if not isReady():
+        return notReadyResponse()
+    return chatbot_service.qa_model.intent_stats()
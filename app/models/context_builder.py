@@ -0,0 +1,74 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ContextBuilder:
+    # Arma el contexto del prompt a partir de los resultados de la búsqueda, en
+    # orden de relevancia: descarta los fragmentos repetidos y respeta un límite
+    # de token_budget tokens. Un documento que no entra completo se recorta por
+    # campos enteros ("Campo: valor" por línea), no por el final, para no perder
+    # campos como las referencias bibliográficas, que van al final del sílabo.
+    def __init__(self, token_budget=7000, encoding_name="o200k_base", min_part_tokens=64):
+        self.token_budget = token_budget
+        self.min_part_tokens = min_part_tokens
+        self.encoding = None
+        try:
+            import tiktoken
+            self.encoding = tiktoken.get_encoding(encoding_name)
+        except Exception as e:
+            # tiktoken descarga la codificación la primera vez; sin ella se estima
+            # a razón de 4 caracteres por token
+            logger.warning(f"No se pudo cargar el tokenizador {encoding_name}, se estimarán los tokens: {e}")
+
+    def count_tokens(self, text):
+        if self.encoding is not None:
+            return len(self.encoding.encode(text))
+        return (len(text) + 3) // 4
+
+    def unique_blocks(self, hits):
+        blocks = []
+        seen = set()
+        for hit in hits:
+            text = (hit.payload.get("text") or "").strip()
+            if not text or text in seen:
+                continue
+            seen.add(text)
+            blocks.append({"doc_type": hit.payload.get("doc_type", "unknown"), "text": text})
+        return blocks
+
+    def fit_fields(self, text, max_tokens):
+        # Conserva, en orden, las líneas que caben; las que no caben se omiten
+        kept = []
+        used = 0
+        for line in text.split("\n"):
+            tokens = self.count_tokens(line) + 1
+            if used + tokens <= max_tokens:
+                kept.append(line)
+                used += tokens
+        return "\n".join(kept), used
+
+    def build(self, hits):
+        blocks = self.unique_blocks(hits)
+        parts = []
+        used_tokens = 0
+        trimmed = 0
+        for block in blocks:
+            header = f"Documento {len(parts) + 1} ({block['doc_type']}):\n"
+            header_tokens = self.count_tokens(header)
+            tokens = header_tokens + self.count_tokens(block["text"]) + 1
+            if used_tokens + tokens <= self.token_budget:
+                parts.append(header + block["text"])
+                used_tokens += tokens
+                continue
+            # Los siguientes documentos pueden ser más cortos: no se corta el recorrido
+            remaining = self.token_budget - used_tokens - header_tokens - 1
+            if remaining < self.min_part_tokens:
+                continue
+            text, tokens = self.fit_fields(block["text"], remaining)
+            if tokens >= self.min_part_tokens:
+                parts.append(header + text)
+                used_tokens += header_tokens + tokens + 1
+                trimmed += 1
+
+        logger.debug(f"Contexto: {len(hits)} resultados, {len(blocks)} únicos, {len(parts)} incluidos ({trimmed} recortados), ~{used_tokens} tokens")
+        return "\n\n".join(parts), {"hits": len(hits), "documents": len(parts), "trimmed": trimmed, "tokens": used_tokens}
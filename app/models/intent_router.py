@@ -0,0 +1,250 @@
+import logging
+import re
+import threading
+from typing import Callable, NamedTuple, Optional, Tuple
+import numpy as np
+from app.utils.answer_cache import normalizeQuestion
+
+logger = logging.getLogger(__name__)
+
+class Intent(NamedTuple):
+    name: str
+    doc_type: Optional[str]
+    fast_path: bool
+    examples: Tuple[str, ...]
+
+# Cada intención se representa por el centroide de los embeddings de sus
+# ejemplos. Las de listado (fast_path) se pueden responder con las filas del CSV;
+# las demás siempre pasan por el LLM
+INTENTS = (
+    Intent("promo_lista", "promo", True, (
+        "¿Qué promociones hay para estudiantes de la universidad?",
+        "¿Qué descuentos tengo con mi carnet universitario?",
+        "Lista de beneficios y promociones para alumnos de UTEC",
+        "¿Dónde hay descuentos para estudiantes?",
+        "¿Qué descuento tienen los estudiantes en este restaurante?",
+        "¿Hay alguna promoción en restaurantes o entretenimiento?",
+    )),
+    Intent("deporte_lista", "deporte", True, (
+        "¿Qué deportes puedo practicar en la universidad?",
+        "¿Cómo puedo reservar una cancha de fútbol?",
+        "¿Dónde reservo la mesa de tenis de mesa o el futbolín?",
+        "Link para reservar una cancha de básquet",
+        "¿Cuánto tiempo puedo reservar una cancha deportiva?",
+        "¿Qué actividades deportivas y recreativas hay en UTEC?",
+    )),
+    Intent("organizacion_lista", "organization", True, (
+        "¿Qué organizaciones estudiantiles existen en UTEC?",
+        "¿Cuál es el correo de la organización estudiantil?",
+        "Lista de grupos estudiantiles de arte y cultura",
+        "¿Qué organizaciones de acción social o voluntariado hay?",
+        "¿Cómo contacto a una organización estudiantil especializada?",
+        "¿Hay algún club deportivo o comunidad IEEE para unirme?",
+    )),
+    Intent("empleo_lista", "empleo", True, (
+        "¿Qué ofertas de empleo hay para estudiantes?",
+        "¿Qué empresas están buscando practicantes de ingeniería industrial?",
+        "Ofertas de trabajo para ingeniería civil",
+        "¿Piden inglés para las ofertas laborales?",
+        "¿Cuánta experiencia piden las ofertas de empleo publicadas?",
+        "¿Hay bolsa de trabajo o prácticas profesionales disponibles?",
+    )),
+    Intent("silabo", "syllabus", False, (
+        "¿Me recomiendas alguna referencia bibliográfica del curso?",
+        "¿Cuántos créditos tiene el curso de fundamentos de marketing?",
+        "¿Cómo es el sistema de evaluación del curso?",
+        "¿Qué temas se ven en el curso de tendencias en tecnología?",
+        "¿Cuáles son los objetivos y competencias del sílabo?",
+        "¿El curso es presencial o virtual?",
+    )),
+    Intent("general", None, False, (
+        "¿Qué técnicas de estudio me recomiendas para los exámenes?",
+        "¿Cómo puedo organizar mejor mi tiempo para estudiar?",
+        "Hola, ¿en qué me puedes ayudar?",
+        "¿Qué materiales de estudio me sirven para aprender programación?",
+        "Gracias por la ayuda",
+        "Necesito consejos para mejorar mis notas",
+    )),
+)
+
+# Pedidos explícitos de listado ("¿qué ... hay?", "lista de...", "¿cuáles...?"),
+# sobre la pregunta normalizada (minúsculas y sin tildes)
+LISTING_PATTERN = re.compile(
+    r"\b(lista|listado|listame|muestrame|cuales|todas|todos|opciones"
+    r"|que( \w+){1,3} (hay|existen|ofrecen|puedo)|hay (algun|alguna|algunos|algunas))\b"
+)
+
+def isListingRequest(question):
+    return LISTING_PATTERN.search(normalizeQuestion(question)) is not None
+
+def truncate(text, max_length=200):
+    text = " ".join((text or "").split())
+    return text if len(text) <= max_length else text[:max_length].rstrip() + "..."
+
+def omittedLine(omitted, refine):
+    # Las respuestas directas no pasan por el LLM: si se recortó la lista, se dice
+    if not omitted:
+        return []
+    return [f"- ... y {omitted} más. Pregunta por {refine} para ver el resto."]
+
+def formatPromos(rows, filtered, omitted=0):
+    lines = ["*Promociones para estudiantes UTEC"]
+    for row in rows:
+        line = f"- {row.get('Lugar', '').strip()}: {row.get('Titulo', '').strip()}"
+        if filtered:
+            line += f" {truncate(row.get('Descripción'))}"
+        lines.append(line)
+    lines.extend(omittedLine(omitted, "un lugar"))
+    lines.append("¿Quieres más detalles sobre alguna promoción? 🎉")
+    return "\n".join(lines)
+
+def formatDeportes(rows, filtered, omitted=0):
+    lines = ["*Deportes y actividades con reserva"]
+    for row in rows:
+        lines.append(
+            f"- {row.get('Deporte', '').strip()} ({row.get('Categoría', '').strip()}): "
+            f"{row.get('Lugar', '').strip()}, reservas de {row.get('Tiempo de reserva', '').strip()}. "
+            f"Reserva aquí: {row.get('Link para hacer reserva', '').strip()}"
+        )
+    lines.extend(omittedLine(omitted, "un deporte"))
+    lines.append("¿Necesitas ayuda con alguna reserva? ⚽")
+    return "\n".join(lines)
+
+def formatOrganizaciones(rows, filtered, omitted=0):
+    lines = ["*Organizaciones estudiantiles"]
+    if filtered:
+        for row in rows:
+            lines.append(
+                f"- {row.get('Nombre de Organizacion', '').strip()} ({row.get('Tipo de Organizacion', '').strip()}): "
+                f"{row.get('Correo de Organizacion', '').strip()}. {truncate(row.get('Descripcion de la Organizacion'))}"
+            )
+    else:
+        # Sin una organización o tipo mencionado, solo los nombres por tipo
+        by_type = {}
+        for row in rows:
+            by_type.setdefault(row.get('Tipo de Organizacion', '').strip(), []).append(row.get('Nombre de Organizacion', '').strip())
+        for org_type, names in by_type.items():
+            lines.append(f"- {org_type}: {', '.join(names)}")
+    lines.extend(omittedLine(omitted, "una organización o un tipo (especializadas, de proyectos, arte y cultura...)"))
+    lines.append("¿Quieres el correo o más detalles de alguna organización? 🤝")
+    return "\n".join(lines)
+
+def formatEmpleos(rows, filtered, omitted=0):
+    lines = ["*Ofertas de empleo"]
+    for row in rows:
+        line = f"- {row.get('Tipo de Empresa', '').strip()}: {row.get('Tipo de Carrera', '').strip()} ({row.get('Fecha de Publicacion', '').strip()})"
+        if filtered:
+            line += f", experiencia {row.get('Experiencia', '').strip()}, inglés requerido: {row.get('Ingles Requerido', '').strip()}"
+        lines.append(line)
+    lines.extend(omittedLine(omitted, "una empresa o carrera"))
+    lines.append("¿Te interesa alguna de estas ofertas? 💼")
+    return "\n".join(lines)
+
+class FastAnswer(NamedTuple):
+    formatter: Callable
+    columns: Tuple[str, ...]
+
+# Por tipo de documento: plantilla de la respuesta y columnas cuyos valores,
+# mencionados en la pregunta, filtran las filas
+FAST_ANSWERS = {
+    "promo": FastAnswer(formatPromos, ("Lugar",)),
+    "deporte": FastAnswer(formatDeportes, ("Deporte",)),
+    "organization": FastAnswer(formatOrganizaciones, ("Nombre de Organizacion", "Tipo de Organizacion")),
+    "empleo": FastAnswer(formatEmpleos, ("Tipo de Empresa", "Tipo de Carrera")),
+}
+
+class Route(NamedTuple):
+    intent: Intent
+    score: float
+    margin: float
+
+class IntentRouter:
+    # Clasifica la pregunta por el centroide más cercano a su embedding (el mismo
+    # que se usa para buscar, sin llamadas extra al encoder) y responde las
+    # intenciones de listado con las filas de los CSV en memoria
+    def __init__(self, embeddings, rows=None, max_items=15):
+        self.embeddings = embeddings
+        self.max_items = max_items
+        self.lock = threading.Lock()
+        self.centroids = None
+        self.counts = {intent.name: 0 for intent in INTENTS}
+        self.fast_answers = 0
+        self.declined = 0
+        # Valores normalizados de las columnas de filtro, calculados una sola vez
+        self.rows = {}
+        for doc_type, doc_rows in (rows or {}).items():
+            columns = FAST_ANSWERS[doc_type].columns
+            self.rows[doc_type] = [
+                (row, {normalizeQuestion(row.get(column) or "") for column in columns})
+                for row in doc_rows
+            ]
+
+    def load(self):
+        # Los centroides se calculan al primer uso (o en warmup) con el mismo encoder
+        if self.centroids is None:
+            with self.lock:
+                if self.centroids is None:
+                    centroids = []
+                    for intent in INTENTS:
+                        vectors = np.asarray(self.embeddings.embed_documents(list(intent.examples)), dtype=np.float32)
+                        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+                        centroid = vectors.mean(axis=0)
+                        centroids.append(centroid / max(np.linalg.norm(centroid), 1e-12))
+                    self.centroids = np.stack(centroids)
+                    logger.info(f"Enrutador de intenciones listo: {len(INTENTS)} intenciones")
+        return self.centroids
+
+    def classify(self, query_vector):
+        vector = np.asarray(query_vector, dtype=np.float32)
+        scores = self.load() @ (vector / max(np.linalg.norm(vector), 1e-12))
+        order = np.argsort(-scores)
+        best = INTENTS[order[0]]
+        margin = float(scores[order[0]] - scores[order[1]])
+        with self.lock:
+            self.counts[best.name] += 1
+        return Route(best, float(scores[order[0]]), margin)
+
+    def fast_rows(self, question, intent):
+        # Filas con las que se respondería sin LLM (hasta max_items), si están
+        # filtradas y cuántas quedaron fuera; o None si corresponde el LLM
+        if not intent.fast_path or not self.rows.get(intent.doc_type):
+            return None
+        rows = self.rows[intent.doc_type]
+        text = f" {normalizeQuestion(question)} "
+        # Filtra por los valores mencionados como palabra completa ("UTEC" no
+        # coincide dentro de otra palabra)
+        matches = [row for row, values in rows if any(len(value) >= 3 and f" {value} " in text for value in values)]
+        if matches:
+            selected, filtered = matches, True
+        elif isListingRequest(question):
+            # Sin menciones, la lista completa solo responde a un pedido de
+            # listado; otras preguntas ("¿cuánto dura la reserva?") pasan por el LLM
+            selected, filtered = [row for row, _ in rows], False
+        else:
+            return None
+        return selected[:self.max_items], filtered, max(0, len(selected) - self.max_items)
+
+    def fast_answer(self, question, intent):
+        # Respuesta armada con las filas del CSV, o None si corresponde el LLM
+        selected = self.fast_rows(question, intent)
+        if selected is None:
+            if intent.fast_path:
+                with self.lock:
+                    self.declined += 1
+            return None
+        with self.lock:
+            self.fast_answers += 1
+        rows, filtered, omitted = selected
+        return FAST_ANSWERS[intent.doc_type].formatter(rows, filtered, omitted)
+
+    def warmup(self):
+        self.load()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "routes": dict(self.counts),
+                "fast_answers": self.fast_answers,
+                "declined": self.declined,
+                "rows": {doc_type: len(rows) for doc_type, rows in self.rows.items()},
+            }
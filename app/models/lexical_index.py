@@ -0,0 +1,103 @@
+import logging
+import re
+import unicodedata
+from collections import Counter, defaultdict
+import numpy as np
+from app.models.vector_store import SearchHit
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+SPANISH_STOPWORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes como con contra cual cuales cuando
+de del desde donde dos e el ella ellas ello ellos en entre era eres es esa esas ese eso esos
+esta estan estas este esto estos fue fueron ha han hay la las le les lo los mas me mi mis muy
+ni no nos o os otra otro para pero poco por porque que quien se sea ser si sin sobre son su
+sus tambien te tiene tienen toda todas todo todos tu tus u un una unas uno unos y ya yo
+""".split())
+
+def foldAccents(text):
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+def tokenize(text):
+    tokens = []
+    for token in TOKEN_PATTERN.findall(foldAccents(text)):
+        if token in SPANISH_STOPWORDS:
+            continue
+        # Plural simple: "canchas" y "cancha" comparten término
+        if len(token) > 4 and token.endswith("s") and not token[-2].isdigit():
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+class BM25Index:
+    # Índice invertido construido una sola vez en la carga. El peso BM25 de cada
+    # (término, documento) se precalcula, así una consulta solo suma arrays.
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids = []
+        self.payloads = []
+        self.doc_types = np.array([], dtype=object)
+        self.postings = {}
+
+    def build(self, ids, texts, payloads):
+        self.ids = list(ids)
+        self.payloads = list(payloads)
+        self.doc_types = np.array([payload.get("doc_type") for payload in self.payloads], dtype=object)
+
+        doc_lengths = np.zeros(len(self.ids), dtype=np.float32)
+        term_docs = defaultdict(list)
+        term_freqs = defaultdict(list)
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lengths[row] = sum(counts.values())
+            for term, freq in counts.items():
+                term_docs[term].append(row)
+                term_freqs[term].append(freq)
+
+        num_docs = len(self.ids)
+        avg_length = float(doc_lengths.mean()) if num_docs else 0.0
+        self.postings = {}
+        for term, rows in term_docs.items():
+            rows = np.array(rows, dtype=np.int32)
+            freqs = np.array(term_freqs[term], dtype=np.float32)
+            idf = np.log(1.0 + (num_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * doc_lengths[rows] / (avg_length or 1.0))
+            self.postings[term] = (rows, (idf * freqs * (self.k1 + 1.0) / (freqs + norm)).astype(np.float32))
+
+        logger.info(f"Índice léxico construido: {num_docs} fragmentos, {len(self.postings)} términos")
+
+    def search(self, query, doc_type=None, limit=5):
+        if not self.ids:
+            return []
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is not None:
+                rows, weights = posting
+                scores[rows] += weights
+
+        if doc_type:
+            scores[self.doc_types != doc_type] = 0.0
+        matched = np.flatnonzero(scores > 0)
+        if matched.size == 0:
+            return []
+
+        k = min(limit, matched.size)
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [SearchHit(self.ids[row], float(scores[row]), self.payloads[row]) for row in top]
+
+def reciprocalRankFusion(result_lists, k=60, limit=5):
+    fused = {}
+    hits = {}
+    for results in result_lists:
+        for rank, hit in enumerate(results, start=1):
+            fused[hit.id] = fused.get(hit.id, 0.0) + 1.0 / (k + rank)
+            hits.setdefault(hit.id, hit)
+
+    ranked = sorted(fused, key=fused.get, reverse=True)[:limit]
+    return [SearchHit(point_id, fused[point_id], hits[point_id].payload) for point_id in ranked]
@@ -1,18 +1,46 @@
+import hashlib
 import logging
+import time
 import uuid
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_qdrant import Qdrant
-from langchain.chains import ConversationalRetrievalChain
-from langchain.prompts import PromptTemplate
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from langchain.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
 from app.config import config
+from app.models.vector_store import VectorPoint, QdrantVectorStore, LocalVectorStore
+from app.models.lexical_index import BM25Index, reciprocalRankFusion
+from app.models.context_builder import ContextBuilder
+from app.models.intent_router import IntentRouter
+from app.utils.embedding_cache import EmbeddingCache, CachedEmbeddings
+from app.utils.embedding_batcher import BatchingEmbeddings
+from app.utils.embedding_backend import createEmbeddings, embeddingIdentity, LEGACY_EMBEDDING_IDENTITY
+from app.utils.lazy_embeddings import LazyEmbeddings
+from app.utils.metrics import span, ANSWER_CACHE_LOOKUPS, LLM_TOKENS, RETRIEVED_CHUNKS, INTENT_ROUTES, INTENT_CONFIDENCE
+from app.utils.answer_cache import ANY_SCOPE, AnswerCache, normalizeQuestion
+from app.utils.message_splitter import SectionStream, splitMessage
+from app.utils.single_flight import SingleFlight
+from app.utils.index_lock import IndexLock
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-PROMPT_TEMPLATE = """
+# Espacio de nombres fijo para derivar IDs deterministas de los fragmentos
+DOCUMENT_ID_NAMESPACE = uuid.UUID("6f1c7a52-3d0e-4b8a-9a43-2f5d8c1e7b90")
+
+EMBEDDING_IDENTITY = embeddingIdentity(config.EMBEDDING_MODEL_NAME, config.EMBEDDING_BACKEND, config.EMBEDDING_ONNX_FILE)
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+# Las instrucciones fijas van en el mensaje de sistema; el contexto y la
+# pregunta, que cambian en cada llamada, van en el mensaje del estudiante
+SYSTEM_PROMPT = """
 Eres un asistente virtual para estudiantes de la Universidad de Ingeniería y Tecnología (UTEC). Tu tarea es proporcionar información precisa y relevante basada en el contenido de los sílabos de los cursos, promociones, actividades deportivas y ofrecer ayuda con materiales y técnicas de estudio. Para mejorar la claridad y efectividad de las respuestas, sigue estas directrices estrictamente:
 
 Formato y estilo:
@@ -24,11 +52,6 @@ Formato y estilo:
 * Usa listas con guiones (-) para enumerar elementos, prohibido usar ** o * en guiones.
 * Para títulos o subtítulos, usa un solo asterisco (*) al inicio de la línea, sin asterisco al final.
 
-Contexto:
-{context}
-
-Pregunta del estudiante: {question}
-
 Instrucciones:
 1. Identifica el tipo de información solicitada (sílabo, promoción, actividad deportiva, materiales de estudio o técnicas de estudio).
 2. Si el nombre del curso no está especificado, intenta inferirlo del contexto o de interacciones previas. Si no es posible, pregunta al estudiante para que aclare.
@@ -51,57 +74,213 @@ Instrucciones:
 10. Asegúrate de que la respuesta sea clara, organizada y útil para el estudiante.
 11. Evita numeración con #.
 12. Divide la respuesta en secciones progresivas y específicas. Pregunta al estudiante si necesita más detalles después de cada sección para estructurar la conversación de manera interactiva.
+"""
+
+QUESTION_TEMPLATE = """Contexto:
+{context}
+
+Pregunta del estudiante: {question}
 
 Respuesta basada en la información proporcionada:
 """
 
+SHORT_QUESTION_ANSWER = "🤔 Por favor, proporciona más detalles para poder ayudarte mejor."
+ERROR_ANSWER = "🙁 Lo siento, tuve un pequeño problema al procesar tu pregunta. ¿Podrías intentar reformularla?"
+STREAM_ERROR_ANSWER = "🙁 Lo siento, no pude completar la respuesta. ¿Podrías intentar de nuevo?"
+
 class QAModel:
-    def __init__(self, texts):
-        logger.info(f"QAModel inicializado con {len(texts)} documentos")
-        prompt = PromptTemplate(template=PROMPT_TEMPLATE, input_variables=["context", "question"])
+    def __init__(self, texts, rows=None, entity_terms=(), data_version=None):
+        logger.info("Inicializando QAModel")
+        self.prompt = ChatPromptTemplate.from_messages([("system", SYSTEM_PROMPT), ("human", QUESTION_TEMPLATE)])
+        self.context_builder = ContextBuilder(config.CONTEXT_TOKEN_BUDGET, config.TOKENIZER_ENCODING)
 
         self.collection_name = config.QDRANT_COLLECTION_NAME
-        self.embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-mpnet-base-v2")
-        self.qdrant_client = QdrantClient(url=config.QDRANT_URL, api_key=config.QDRANT_API_KEY)
+        self.base_embeddings = LazyEmbeddings(lambda: createEmbeddings(
+            config.EMBEDDING_MODEL_NAME,
+            backend=config.EMBEDDING_BACKEND,
+            threads=config.EMBEDDING_THREADS,
+            onnx_file=config.EMBEDDING_ONNX_FILE
+        ))
+        self.embeddings = self.base_embeddings
+        self.embedding_batcher = None
+        if config.EMBED_QUERY_MAX_WAIT_MS > 0:
+            self.embedding_batcher = BatchingEmbeddings(
+                self.embeddings,
+                max_batch_size=config.EMBED_QUERY_BATCH_SIZE,
+                max_wait_ms=config.EMBED_QUERY_MAX_WAIT_MS
+            )
+            self.embeddings = self.embedding_batcher
+        self.embedding_cache = None
+        if config.EMBEDDING_CACHE_DIR:
+            self.embedding_cache = EmbeddingCache(
+                config.EMBEDDING_CACHE_DIR,
+                EMBEDDING_IDENTITY,
+                config.EMBEDDING_CACHE_DTYPE,
+                max_entries=config.EMBEDDING_CACHE_MAX_ENTRIES
+            )
+            self.embeddings = CachedEmbeddings(self.embeddings, self.embedding_cache, query_cache_size=config.QUERY_EMBEDDING_CACHE_SIZE)
 
-        self.qdrant = Qdrant(
-            client=self.qdrant_client,
-            collection_name=self.collection_name,
-            embeddings=self.embeddings,
-        )
+        if config.VECTOR_BACKEND == "local":
+            self.vector_store = LocalVectorStore(config.LOCAL_INDEX_PATH)
+        else:
+            qdrant_client = QdrantClient(url=config.QDRANT_URL, api_key=config.QDRANT_API_KEY)
+            self.vector_store = QdrantVectorStore(qdrant_client, self.collection_name)
 
-        self.llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0.3, max_tokens=300)
-        self.qa_chain = ConversationalRetrievalChain.from_llm(
-            llm=self.llm,
-            retriever=self.qdrant.as_retriever(search_kwargs={"k": 3}),
-            combine_docs_chain_kwargs={"prompt": prompt},
-            return_source_documents=True
-        )
+        self.llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0.3, max_tokens=300, stream_usage=True)
 
-        self.clear_collection()
-        self.load_documents(texts)
+        self.answer_cache = None
+        if config.ANSWER_CACHE_SIZE > 0:
+            self.answer_cache = AnswerCache(
+                max_entries=config.ANSWER_CACHE_SIZE,
+                ttl_seconds=config.ANSWER_CACHE_TTL,
+                similarity_threshold=config.ANSWER_CACHE_SIMILARITY,
+                entity_terms=entity_terms
+            )
+
+        self.single_flight = SingleFlight(timeout=config.SINGLE_FLIGHT_TIMEOUT) if config.SINGLE_FLIGHT else None
+
+        # rows: filas de los CSV por tipo de documento para las respuestas directas
+        self.intent_router = None
+        if config.INTENT_ROUTER:
+            self.intent_router = IntentRouter(
+                self.embeddings,
+                rows=rows if config.INTENT_FAST_PATH else None,
+                max_items=config.INTENT_FAST_PATH_MAX_ITEMS
+            )
+
+        # texts puede ser un generador: se recorre una sola vez, indexando y
+        # armando el índice léxico a medida que llegan los fragmentos
+        self.lexical_index = None
+        # data_version: huella de los datasets de origen; si el marcador indica
+        # que ya se indexaron con este modelo y despliegue, no se sincroniza
+        source_version = self.source_version(data_version)
+        self.index_lock = IndexLock(config.INDEX_LOCK_PATH, config.INDEX_VERSION_PATH, config.INDEX_LOCK_TIMEOUT)
+        with self.index_lock.exclusive():
+            # Otro worker pudo actualizar el índice mientras se esperaba el lock
+            self.vector_store.load()
+            marker = self.index_lock.read_marker()
+            rebuild = config.INDEX_SYNC_MODE == "rebuild" and not self.rebuilt_in_deploy(marker)
+            if not rebuild and self.index_is_current(marker, source_version):
+                logger.info(f"El índice ya está al día (versión {marker['corpus_version']}), no se sincroniza")
+                self.index_lexical(texts)
+                self.apply_corpus_version(marker["corpus_version"])
+            else:
+                if rebuild:
+                    self.vector_store.clear()
+                point_ids = self.sync_documents(texts)
+                self.set_corpus_version(point_ids)
+                self.index_lock.write_marker(self.corpus_version, len(point_ids), source_version, config.INDEX_DEPLOY_ID)
 
-    def clear_collection(self):
-        logger.info(f"Limpiando la colección {self.collection_name}")
+    @staticmethod
+    def content_hash(content):
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def document_id(text):
+        # El ID depende solo del contenido, la fuente, el tipo y el modelo de
+        # embeddings: el mismo fragmento conserva su ID entre reinicios, y un
+        # cambio de contenido, de modelo o de backend genera uno nuevo y se
+        # reindexa, sin mezclar vectores de dos espacios en el índice. El modelo
+        # original no añade su identidad, así sus índices siguen siendo válidos
+        source = text.metadata.get('source', '')
+        doc_type = text.metadata.get('type', 'unknown')
+        key = f"{doc_type}|{source}|{QAModel.content_hash(text.page_content)}"
+        if EMBEDDING_IDENTITY != LEGACY_EMBEDDING_IDENTITY:
+            key += f"|{EMBEDDING_IDENTITY}"
+        return str(uuid.uuid5(DOCUMENT_ID_NAMESPACE, key))
+
+    @staticmethod
+    def source_version(data_version):
+        # Lo que determina el contenido del índice: los datos, los vectores y el despliegue
+        if data_version is None:
+            return None
+        key = f"{data_version}|{EMBEDDING_IDENTITY}|{config.INDEX_DEPLOY_ID}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def rebuilt_in_deploy(marker):
+        # Con INDEX_DEPLOY_ID se reconstruye una vez por despliegue declarado; sin
+        # él, una vez desde el inicio del proceso maestro (requiere preload_app)
+        if not marker:
+            return False
+        if config.INDEX_DEPLOY_ID:
+            return marker.get("deploy_id") == config.INDEX_DEPLOY_ID
+        return marker.get("updated_at", 0) >= config.STARTED_AT
+
+    def index_is_current(self, marker, source_version):
+        if not marker or source_version is None or marker.get("source_version") != source_version:
+            return False
+        # El marcador no basta si el índice se perdió (colección borrada, otra ruta local)
         try:
-            self.qdrant_client.delete_collection(self.collection_name)
-            logger.info(f"Colección {self.collection_name} eliminada")
+            return self.vector_store.count() == marker.get("points")
         except Exception as e:
-            logger.warning(f"Error al eliminar la colección: {e}")
-        
-        self.create_collection_if_not_exists()
-
-    def create_collection_if_not_exists(self):
-        collections = self.qdrant_client.get_collections().collections
-        if not any(collection.name == self.collection_name for collection in collections):
-            logger.info(f"Creando nueva colección: {self.collection_name}")
-            self.qdrant_client.create_collection(
-                collection_name=self.collection_name,
-                vectors_config=VectorParams(
-                    size=768, distance=Distance.COSINE),
-            )
-        else:
-            logger.info(f"La colección {self.collection_name} ya existe")
+            logger.warning(f"No se pudo contar los puntos del índice: {e}")
+            return False
+
+    def set_corpus_version(self, point_ids):
+        self.apply_corpus_version(hashlib.sha256("\n".join(sorted(point_ids)).encode("utf-8")).hexdigest()[:16])
+
+    def apply_corpus_version(self, corpus_version):
+        self.corpus_version = corpus_version
+        logger.info(f"Versión del corpus indexado: {self.corpus_version}")
+        if self.answer_cache:
+            self.answer_cache.set_corpus_version(self.corpus_version)
+
+    def unique_texts(self, texts, lexical):
+        # Fragmentos sin repetir con su ID; si se pide, acumula los datos del índice léxico
+        seen_ids = set()
+        for text in texts:
+            point_id = self.document_id(text)
+            if point_id in seen_ids:
+                continue
+            seen_ids.add(point_id)
+            if lexical is not None:
+                lexical[0].append(point_id)
+                lexical[1].append(text.page_content)
+                lexical[2].append(self.build_payload(text))
+            yield point_id, text
+
+    def index_lexical(self, texts):
+        # Índice al día: cada worker solo arma su índice léxico en memoria
+        if config.RETRIEVAL_MODE != "hybrid":
+            return
+        lexical = ([], [], [])
+        for _ in self.unique_texts(texts, lexical):
+            pass
+        self.build_lexical_index(*lexical)
+
+    def sync_documents(self, texts):
+        logger.info("Sincronizando fragmentos con el índice de vectores")
+        self.vector_store.ensure_collection()
+        existing_ids = self.vector_store.list_ids()
+        seen_ids = set()
+        lexical = ([], [], []) if config.RETRIEVAL_MODE == "hybrid" else None
+
+        def new_texts():
+            # Solo pasan al encoder los fragmentos que aún no están en el índice
+            for point_id, text in self.unique_texts(texts, lexical):
+                seen_ids.add(point_id)
+                if point_id not in existing_ids:
+                    yield text
+
+        loaded = self.load_documents(new_texts())
+        stale_ids = [point_id for point_id in existing_ids if point_id not in seen_ids]
+
+        logger.info(
+            f"Sincronización: {len(seen_ids) - loaded} sin cambios, "
+            f"{loaded} nuevos o modificados, {len(stale_ids)} obsoletos"
+        )
+
+        if stale_ids:
+            self.vector_store.delete(stale_ids)
+            logger.info(f"Eliminados {len(stale_ids)} fragmentos obsoletos")
+
+        if loaded or stale_ids:
+            self.vector_store.save()
+
+        if lexical is not None:
+            self.build_lexical_index(*lexical)
+        return seen_ids
 
     def split_content(self, content, max_length=500):
         sections = []
@@ -116,93 +295,292 @@ class QAModel:
             sections.append(current_section.strip())
         return sections
 
+    def build_payload(self, text):
+        content = text.page_content
+        return {
+            'text': content, 
+            'metadata': text.metadata,
+            'doc_type': text.metadata.get('type', 'unknown'),
+            'content_hash': self.content_hash(content)
+        }
+
+    def build_point(self, text, vector):
+        return VectorPoint(
+            id=self.document_id(text),
+            payload=self.build_payload(text),
+            vector=vector
+        )
+
+    def build_lexical_index(self, ids, texts, payloads):
+        self.lexical_index = BM25Index()
+        self.lexical_index.build(ids, texts, payloads)
+
+    def retrieve(self, question, query_vector, doc_type=None, limit=5):
+        # Los resultados densos por debajo de CONTEXT_MIN_SCORE no aportan al
+        # contexto y solo suman tokens
+        if self.lexical_index is None:
+            results = self.vector_store.search(query_vector, doc_type=doc_type, limit=limit)
+            return [hit for hit in results if hit.score >= config.CONTEXT_MIN_SCORE]
+
+        # Búsqueda híbrida: candidatos densos y BM25 combinados por rango recíproco
+        candidates = max(limit, config.HYBRID_CANDIDATES)
+        dense_results = self.vector_store.search(query_vector, doc_type=doc_type, limit=candidates)
+        dense_results = [hit for hit in dense_results if hit.score >= config.CONTEXT_MIN_SCORE]
+        lexical_results = self.lexical_index.search(question, doc_type=doc_type, limit=candidates)
+        return reciprocalRankFusion([dense_results, lexical_results], k=config.RRF_K, limit=limit)
+
+    def upsert_points(self, points):
+        batch_size = config.UPSERT_BATCH_SIZE
+        for start in range(0, len(points), batch_size):
+            batch = points[start:start + batch_size]
+            # Un intento obligatorio más UPSERT_MAX_RETRIES reintentos: con 0 o
+            # menos el lote se intenta una vez y el error se propaga
+            retries = max(0, config.UPSERT_MAX_RETRIES)
+            for attempt in range(retries + 1):
+                try:
+                    self.vector_store.upsert(batch)
+                    break
+                except Exception as e:
+                    if attempt == retries:
+                        logger.error(f"Error al cargar documentos en el índice tras {attempt + 1} intentos: {e}")
+                        raise
+                    delay = 2 ** attempt
+                    logger.warning(f"Error al cargar lote en el índice (reintento {attempt + 1} de {retries}): {e}. Reintentando en {delay}s")
+                    time.sleep(delay)
+
     def load_documents(self, texts):
-        logger.info(f"Cargando {len(texts)} documentos en Qdrant")
-        points = []
-        for text in texts:
-            content = text.page_content
-            vector = self.embeddings.embed_query(content)
-            point = PointStruct(
-                id=str(uuid.uuid4()),  # Generamos un UUID único para cada punto
-                payload={
-                    'text': content, 
-                    'metadata': text.metadata,
-                    'doc_type': text.metadata.get('type', 'unknown')
-                },
-                vector=vector
-            )
-            points.append(point)
+        logger.info("Cargando documentos en el índice de vectores")
+        loaded = 0
+        # Un único hilo de carga: mientras se sube el lote anterior se embebe el
+        # siguiente, y como mucho hay un lote pendiente en memoria
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pending = None
+            for batch in batched(texts, config.EMBED_BATCH_SIZE):
+                vectors = self.embeddings.embed_documents([text.page_content for text in batch])
+                points = [self.build_point(text, vector) for text, vector in zip(batch, vectors)]
+                if pending is not None:
+                    pending.result()
+                pending = executor.submit(self.upsert_points, points)
+                loaded += len(points)
+                logger.debug(f"Embebidos {loaded} documentos")
+            if pending is not None:
+                pending.result()
 
-        try:
-            operation_info = self.qdrant_client.upsert(
-                collection_name=self.collection_name,
-                points=points
-            )
-            logger.info(f"Operación de carga completada. Info: {operation_info}")
-        except Exception as e:
-            logger.error(f"Error al cargar documentos en Qdrant: {e}")
-            raise
+        logger.info(f"Documentos cargados exitosamente en el índice: {loaded}")
+        return loaded
+
+    def route(self, question, query_vector):
+        # Intención de la pregunta: respuesta directa si es un listado con
+        # confianza alta, filtro por tipo de documento con confianza media
+        if self.intent_router is None:
+            return None, None
+        with span("route") as attributes:
+            route = self.intent_router.classify(query_vector)
+            attributes.update(intent=route.intent.name, score=round(route.score, 4), margin=round(route.margin, 4))
+        INTENT_CONFIDENCE.observe(route.score, intent=route.intent.name)
+        logger.debug(f"Intención {route.intent.name} (score {route.score:.4f}, margen {route.margin:.4f})")
+
+        if config.INTENT_FAST_PATH and route.score >= config.INTENT_FAST_PATH_THRESHOLD and route.margin >= config.INTENT_MIN_MARGIN:
+            with span("fast_path", intent=route.intent.name):
+                fast_answer = self.intent_router.fast_answer(question, route.intent)
+            if fast_answer is not None:
+                INTENT_ROUTES.inc(intent=route.intent.name, path="fast")
+                logger.info(f"Respuesta directa desde los datos ({route.intent.name})")
+                return None, fast_answer
+
+        INTENT_ROUTES.inc(intent=route.intent.name, path="llm")
+        doc_type = route.intent.doc_type if route.score >= config.INTENT_ROUTE_THRESHOLD else None
+        return doc_type, None
+
+    def flight_key(self, question):
+        # El enrutado depende solo de la pregunta: basta la pregunta normalizada
+        return normalizeQuestion(question)
+
+    def prepare_answer(self, question):
+        # Devuelve la respuesta en caché o directa si existe o, si no, los mensajes para el LLM
+        logger.debug("Iniciando búsqueda en el índice de vectores")
+
+        # Antes del embedding no se conoce el filtro, pero una pregunta idéntica
+        # se enruta igual: la coincidencia exacta vale en cualquier ámbito
+        if self.answer_cache:
+            cached_answer = self.answer_cache.get_exact(ANY_SCOPE, question)
+            if cached_answer is not None:
+                ANSWER_CACHE_LOOKUPS.inc(result="exact_hit")
+                logger.info("Respuesta obtenida de la caché (coincidencia exacta)")
+                return cached_answer, None
+
+        with span("embed_query"):
+            query_vector = self.embeddings.embed_query(question)
+
+        doc_type, fast_answer = self.route(question, query_vector)
+        if fast_answer is not None:
+            return fast_answer, None
+
+        # Dos preguntas parecidas pueden quedar a distinto lado de los umbrales
+        # de enrutado: la coincidencia semántica se limita al mismo filtro
+        cache_scope = doc_type or "all"
+        if self.answer_cache:
+            cached_answer = self.answer_cache.get_similar(cache_scope, question, query_vector)
+            if cached_answer is not None:
+                ANSWER_CACHE_LOOKUPS.inc(result="semantic_hit")
+                logger.info("Respuesta obtenida de la caché (pregunta similar)")
+                return cached_answer, None
+            ANSWER_CACHE_LOOKUPS.inc(result="miss")
+
+        with span("retrieve", doc_type=doc_type) as attributes:
+            search_results = self.retrieve(question, query_vector, doc_type=doc_type, limit=config.CONTEXT_MAX_CHUNKS)
+            attributes["chunks"] = len(search_results)
+        RETRIEVED_CHUNKS.observe(len(search_results))
+
+        for i, result in enumerate(search_results):
+            logger.debug("Documento %d: ID %s, score %.4f, tipo %s", i + 1, result.id, result.score, result.payload.get('doc_type', 'unknown'))
+
+        with span("build_context") as attributes:
+            context, context_stats = self.context_builder.build(search_results)
+            attributes.update(context_stats)
+
+        messages = self.prompt.format_messages(
+            context=context,
+            question=question
+        )
+        return None, {"messages": messages, "cache_scope": cache_scope, "query_vector": query_vector}
 
-        logger.info("Documentos cargados exitosamente en Qdrant")
+    def record_usage(self, attributes, usage):
+        usage = usage or {}
+        attributes["prompt_tokens"] = usage.get("input_tokens", 0)
+        attributes["completion_tokens"] = usage.get("output_tokens", 0)
+        LLM_TOKENS.inc(attributes["prompt_tokens"], kind="prompt")
+        LLM_TOKENS.inc(attributes["completion_tokens"], kind="completion")
+
+    def store_answer(self, question, request, response):
+        logger.debug("Respuesta generada: %s", response)
+        if self.answer_cache:
+            self.answer_cache.put(request["cache_scope"], question, request["query_vector"], response)
+
+    def compute_answer(self, question):
+        cached_answer, request = self.prepare_answer(question)
+        if cached_answer is not None:
+            return cached_answer
+
+        with span("llm") as attributes:
+            message = self.llm.invoke(request["messages"])
+            self.record_usage(attributes, getattr(message, "usage_metadata", None))
+        response = message.content
+
+        self.store_answer(question, request, response)
+        return response
 
     def getAnswer(self, question):
         logger.info(f"Procesando pregunta: {question}")
         if len(question.split()) < 3:
-            return "🤔 Por favor, proporciona más detalles para poder ayudarte mejor."
+            return SHORT_QUESTION_ANSWER
         try:
-            logger.debug("Iniciando búsqueda en Qdrant")
-        
-            if "promociones" in question.lower() and "universidad" in question.lower():
-                query_filter = {"must": [{"key": "doc_type", "match": {"value": "promo"}}]}
-            elif any(word in question.lower() for word in ["deporte", "cancha", "reserva"]):
-                query_filter = {"must": [{"key": "doc_type", "match": {"value": "deporte"}}]}
-            else:
-                query_filter = None
-
-            query_vector = self.embeddings.embed_query(question)
-            search_results = self.qdrant_client.search(
-                collection_name=self.collection_name,
-                query_vector=query_vector,
-                query_filter=query_filter,
-                limit=5
-            )
-        
-            full_context = []
-            for i, result in enumerate(search_results):
-                logger.debug(f"Documento {i+1}:")
-                logger.debug(f"ID: {result.id}, Score: {result.score}")
-                logger.debug(f"Tipo: {result.payload.get('doc_type', 'unknown')}")
-                logger.debug(f"Contenido: {result.payload['text'][:200]}...")
-                full_context.append(f"Documento {i+1} ({result.payload.get('doc_type', 'unknown')}):\n{result.payload['text']}")
-        
-            context = "\n\n".join(full_context)
-            logger.debug(f"Contexto completo pasado al modelo:\n{context}")
-        
-            prompt = self.qa_chain.combine_docs_chain.llm_chain.prompt.format(
-                context=context,
-                question=question
+            if self.single_flight is None:
+                return self.compute_answer(question)
+            # Las preguntas idénticas simultáneas comparten una sola búsqueda y llamada al LLM
+            return self.single_flight.do(
+                self.flight_key(question),
+                lambda: self.compute_answer(question)
             )
-            response = self.qa_chain.combine_docs_chain.llm_chain.llm.predict(prompt)
-        
-            logger.debug(f"Respuesta generada: {response}")
-            return response
         except Exception as e:
             logger.error(f"Error al procesar la pregunta: {str(e)}", exc_info=True)
-            return "🙁 Lo siento, tuve un pequeño problema al procesar tu pregunta. ¿Podrías intentar reformularla?"
+            return ERROR_ANSWER
+
+    def streamAnswer(self, question):
+        # Igual que getAnswer, pero genera la respuesta por secciones: cada una se
+        # entrega en cuanto el LLM la termina, sin superar WHATSAPP_MAX_CHARS
+        logger.info(f"Procesando pregunta en streaming: {question}")
+        if len(question.split()) < 3:
+            yield SHORT_QUESTION_ANSWER
+            return
+        delivered = 0
+        flight = []
+
+        def settle(answer=None, error=None):
+            # Entrega el resultado a las preguntas idénticas que esperan a esta
+            if flight:
+                key, future = flight.pop()
+                self.single_flight.finish(key, future, result=answer, error=error)
 
-    def test_retrieval(self, query):
+        try:
+            if self.single_flight is not None:
+                key = self.flight_key(question)
+                future, leader = self.single_flight.begin(key)
+                if not leader:
+                    # Otra petición ya genera esta respuesta: se espera y se envía
+                    # completa; si no llega a tiempo, se genera aquí
+                    with span("coalesced_wait"):
+                        answer, ready = self.single_flight.wait(future)
+                    if ready:
+                        yield from splitMessage(answer, config.WHATSAPP_MAX_CHARS)
+                        return
+                else:
+                    flight.append((key, future))
+
+            cached_answer, request = self.prepare_answer(question)
+            if cached_answer is not None:
+                settle(cached_answer)
+                yield from splitMessage(cached_answer, config.WHATSAPP_MAX_CHARS)
+                return
+
+            sections = SectionStream(config.STREAM_MIN_SECTION_CHARS, config.WHATSAPP_MAX_CHARS)
+            parts = []
+            usage = None
+            with span("llm", streamed=True) as attributes:
+                started = time.perf_counter()
+                for chunk in self.llm.stream(request["messages"]):
+                    usage = getattr(chunk, "usage_metadata", None) or usage
+                    parts.append(chunk.content)
+                    for section in sections.feed(chunk.content):
+                        if not delivered:
+                            attributes["first_section_ms"] = round(1000.0 * (time.perf_counter() - started), 2)
+                        delivered += 1
+                        yield section
+                self.record_usage(attributes, usage)
+
+            response = "".join(parts).strip()
+            self.store_answer(question, request, response)
+            settle(response)
+            for section in sections.flush():
+                delivered += 1
+                yield section
+        except Exception as e:
+            logger.error(f"Error al procesar la pregunta: {str(e)}", exc_info=True)
+            settle(error=e)
+            # Si ya se enviaron secciones, se avisa que la respuesta quedó incompleta
+            yield STREAM_ERROR_ANSWER if delivered else ERROR_ANSWER
+        finally:
+            settle(error=RuntimeError("La generación de la respuesta se interrumpió"))
+
+    def embedding_stats(self):
+        return {
+            "cache": self.embedding_cache.stats() if self.embedding_cache else None,
+            "query_cache": self.embeddings.query_stats() if self.embedding_cache else None,
+            "batcher": self.embedding_batcher.stats() if self.embedding_batcher else None,
+        }
+
+    def intent_stats(self):
+        return self.intent_router.stats() if self.intent_router else None
+
+    def warmup(self):
+        self.base_embeddings.load()
+        if self.intent_router:
+            self.intent_router.warmup()
+
+    def test_retrieval(self, query, full=False):
         logger.info(f"Probando recuperación para la consulta: {query}")
         query_vector = self.embeddings.embed_query(query)
-        search_result = self.qdrant_client.search(
-            collection_name=self.collection_name,
-            query_vector=query_vector,
-            limit=3
-        )
-        logger.info("Resultados de búsqueda directa en Qdrant:")
+        search_result = self.retrieve(query, query_vector, limit=3)
+        logger.info("Resultados de búsqueda directa en el índice:")
         for result in search_result:
             logger.info(f"ID: {result.id}, Score: {result.score}")
             logger.info(f"Contenido: {result.payload['text'][:200]}...")
 
-        # Probar la cadena completa
-        qa_result = self.getAnswer(query)
-        logger.info(f"Respuesta del modelo: {qa_result}")
+        if not search_result:
+            logger.warning(f"La consulta de prueba no recuperó documentos: {query}")
+
+        # Probar la cadena completa (llama al LLM)
+        if full:
+            qa_result = self.getAnswer(query)
+            logger.info(f"Respuesta del modelo: {qa_result}")
+        return search_result
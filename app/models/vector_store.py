@@ -0,0 +1,290 @@
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, NamedTuple
+import numpy as np
+from qdrant_client.models import Distance, VectorParams, PointStruct, PointIdsList, Filter, FieldCondition, MatchValue
+
+logger = logging.getLogger(__name__)
+
+class VectorPoint(NamedTuple):
+    id: str
+    vector: List[float]
+    payload: Dict[str, Any]
+
+class SearchHit(NamedTuple):
+    id: str
+    score: float
+    payload: Dict[str, Any]
+
+class QdrantVectorStore:
+    # vector_size es la dimensión con que se crea una colección nueva; la de una
+    # colección existente se lee de Qdrant. Si el modelo de embeddings produce
+    # vectores de otra dimensión, la colección se recrea en el primer upsert (sus
+    # puntos son de otro modelo y la sincronización los descartaría igual).
+    def __init__(self, client, collection_name, vector_size=768):
+        self.client = client
+        self.collection_name = collection_name
+        self.vector_size = vector_size
+
+    def ensure_collection(self):
+        collections = self.client.get_collections().collections
+        if not any(collection.name == self.collection_name for collection in collections):
+            logger.info(f"Creando nueva colección: {self.collection_name}")
+            self.client.create_collection(
+                collection_name=self.collection_name,
+                vectors_config=VectorParams(
+                    size=self.vector_size, distance=Distance.COSINE),
+            )
+        else:
+            vectors = self.client.get_collection(self.collection_name).config.params.vectors
+            self.vector_size = getattr(vectors, "size", self.vector_size)
+            logger.info(f"La colección {self.collection_name} ya existe ({self.vector_size} dimensiones)")
+
+    def clear(self):
+        logger.info(f"Limpiando la colección {self.collection_name}")
+        try:
+            self.client.delete_collection(self.collection_name)
+            logger.info(f"Colección {self.collection_name} eliminada")
+        except Exception as e:
+            logger.warning(f"Error al eliminar la colección: {e}")
+
+        self.ensure_collection()
+
+    def count(self):
+        return self.client.count(collection_name=self.collection_name, exact=True).count
+
+    def list_ids(self):
+        existing_ids = set()
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                limit=1000,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False
+            )
+            existing_ids.update(str(point.id) for point in points)
+            if offset is None:
+                break
+        return existing_ids
+
+    def upsert(self, points):
+        if not points:
+            return
+        if len(points[0].vector) != self.vector_size:
+            logger.warning(
+                f"Los embeddings tienen {len(points[0].vector)} dimensiones y la colección "
+                f"{self.collection_name} {self.vector_size}: se recrea la colección"
+            )
+            self.vector_size = len(points[0].vector)
+            self.clear()
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=[PointStruct(id=point.id, vector=point.vector, payload=point.payload) for point in points]
+        )
+
+    def delete(self, ids):
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=PointIdsList(points=list(ids))
+        )
+
+    def search(self, query_vector, doc_type=None, limit=5):
+        query_filter = None
+        if doc_type:
+            query_filter = Filter(must=[FieldCondition(key="doc_type", match=MatchValue(value=doc_type))])
+        results = self.client.search(
+            collection_name=self.collection_name,
+            query_vector=query_vector,
+            query_filter=query_filter,
+            limit=limit
+        )
+        return [SearchHit(str(result.id), result.score, result.payload) for result in results]
+
+    def save(self):
+        # Qdrant persiste por su cuenta
+        pass
+
+    def load(self):
+        # La colección es compartida: no hay nada que recargar
+        pass
+
+class LocalVectorStore:
+    # Índice en memoria para corpus pequeños: los vectores normalizados viven en
+    # una matriz contigua y la búsqueda es un producto matricial más top-k, con
+    # la misma semántica de similitud coseno que la colección de Qdrant.
+    # La matriz tiene capacidad de reserva que se duplica al llenarse, así una
+    # carga masiva por lotes no copia todo el índice en cada lote. Las búsquedas
+    # toman una vista de las primeras filas: los lotes nuevos se escriben después
+    # y el borrado arma matrices nuevas, así que la vista sigue siendo válida.
+    # La dimensión se toma de la instantánea guardada y, si los embeddings
+    # cambian de dimensión, el índice se vacía en el primer upsert.
+    INITIAL_CAPACITY = 256
+
+    def __init__(self, index_path, vector_size=768):
+        self.index_path = index_path
+        self.vector_size = vector_size
+        self.lock = threading.RLock()
+        self.reset()
+        self.load()
+
+    @property
+    def snapshot_path(self):
+        return os.path.join(self.index_path, "index.npz")
+
+    def reset(self):
+        self.set_rows(np.zeros((0, self.vector_size), dtype=np.float32), [], [])
+
+    def set_rows(self, matrix, ids, payloads):
+        self.buffer = np.zeros((max(len(ids), self.INITIAL_CAPACITY), self.vector_size), dtype=np.float32)
+        self.buffer[:len(ids)] = matrix
+        self.doc_type_buffer = np.empty(self.buffer.shape[0], dtype=object)
+        self.doc_type_buffer[:len(ids)] = [payload.get("doc_type") for payload in payloads]
+        self.size = len(ids)
+        self.ids = list(ids)
+        self.payloads = list(payloads)
+        self.rows = {point_id: row for row, point_id in enumerate(self.ids)}
+
+    @property
+    def matrix(self):
+        return self.buffer[:self.size]
+
+    def ensure_capacity(self, rows):
+        if rows <= self.buffer.shape[0]:
+            return
+        capacity = self.buffer.shape[0]
+        while capacity < rows:
+            capacity *= 2
+        buffer = np.zeros((capacity, self.vector_size), dtype=np.float32)
+        buffer[:self.size] = self.buffer[:self.size]
+        doc_type_buffer = np.empty(capacity, dtype=object)
+        doc_type_buffer[:self.size] = self.doc_type_buffer[:self.size]
+        self.buffer, self.doc_type_buffer = buffer, doc_type_buffer
+
+    def ensure_collection(self):
+        pass
+
+    def clear(self):
+        logger.info("Limpiando el índice local")
+        with self.lock:
+            self.reset()
+
+    def count(self):
+        return self.size
+
+    def list_ids(self):
+        with self.lock:
+            return set(self.ids)
+
+    @staticmethod
+    def normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def upsert(self, points):
+        if not points:
+            return
+        vectors = self.normalize([point.vector for point in points])
+        with self.lock:
+            if vectors.shape[1] != self.vector_size:
+                logger.warning(
+                    f"Los embeddings tienen {vectors.shape[1]} dimensiones y el índice local "
+                    f"{self.vector_size}: se descartan sus {self.size} vectores"
+                )
+                self.vector_size = vectors.shape[1]
+                self.reset()
+            new_points = len({point.id for point in points} - self.rows.keys())
+            self.ensure_capacity(self.size + new_points)
+            for point, vector in zip(points, vectors):
+                row = self.rows.get(point.id)
+                if row is None:
+                    # Filas nuevas: primero el vector y el payload, luego el tamaño
+                    row = self.size
+                    self.ids.append(point.id)
+                    self.payloads.append(point.payload)
+                    self.rows[point.id] = row
+                    self.buffer[row] = vector
+                    self.doc_type_buffer[row] = point.payload.get("doc_type")
+                    self.size += 1
+                else:
+                    # Un mismo ID implica el mismo contenido: se reemplaza en su lugar
+                    self.buffer[row] = vector
+                    self.payloads[row] = point.payload
+                    self.doc_type_buffer[row] = point.payload.get("doc_type")
+
+    def delete(self, ids):
+        with self.lock:
+            remove = {self.rows[point_id] for point_id in ids if point_id in self.rows}
+            if not remove:
+                return
+            keep = [row for row in range(self.size) if row not in remove]
+            self.set_rows(self.buffer[keep], [self.ids[row] for row in keep], [self.payloads[row] for row in keep])
+
+    def search(self, query_vector, doc_type=None, limit=5):
+        # Se toma una vista consistente del índice; las escrituras no la alteran
+        with self.lock:
+            size = self.size
+            matrix, doc_types = self.buffer[:size], self.doc_type_buffer[:size]
+            ids, payloads = self.ids, self.payloads
+
+        if not size:
+            return []
+        scores = matrix @ self.normalize(query_vector)
+        candidates = np.arange(size)
+        if doc_type:
+            candidates = np.flatnonzero(doc_types == doc_type)
+            if candidates.size == 0:
+                return []
+            scores = scores[candidates]
+
+        k = min(limit, scores.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [SearchHit(ids[candidates[i]], float(scores[i]), payloads[candidates[i]]) for i in top]
+
+    def save(self):
+        # Vectores, IDs y payloads en un solo archivo reemplazado de forma atómica:
+        # una caída a mitad de la escritura deja la instantánea anterior completa
+        with self.lock:
+            os.makedirs(self.index_path, exist_ok=True)
+            with open(self.snapshot_path + ".tmp", "wb") as f:
+                np.savez(
+                    f,
+                    vectors=self.matrix,
+                    ids=np.array(self.ids, dtype=str),
+                    payloads=np.array(json.dumps(self.payloads, ensure_ascii=False))
+                )
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(self.snapshot_path + ".tmp", self.snapshot_path)
+            # Formato anterior (vectors.npy + points.json), ya reemplazado
+            for name in ("vectors.npy", "points.json"):
+                path = os.path.join(self.index_path, name)
+                if os.path.exists(path):
+                    os.remove(path)
+        logger.info(f"Índice local guardado en {self.index_path} ({len(self.ids)} vectores)")
+
+    def load(self):
+        if not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with np.load(self.snapshot_path, allow_pickle=False) as snapshot:
+                matrix = snapshot["vectors"]
+                ids = snapshot["ids"].tolist()
+                payloads = json.loads(str(snapshot["payloads"]))
+        except Exception as e:
+            logger.warning(f"No se pudo cargar el índice local desde {self.index_path}: {e}")
+            return
+        if matrix.ndim != 2 or matrix.shape[0] != len(ids) or len(payloads) != len(ids):
+            logger.warning(f"Índice local en {self.index_path} inconsistente, se ignorará")
+            return
+
+        with self.lock:
+            self.vector_size = matrix.shape[1]
+            self.set_rows(matrix.astype(np.float32, copy=False), ids, payloads)
+        logger.info(f"Índice local cargado desde {self.index_path} ({len(self.ids)} vectores)")
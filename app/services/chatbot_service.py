@@ -1,30 +1,79 @@
+from app.config import config
 from app.models.qa_model import QAModel
-from app.utils.data_loader import loadAndSplitData
+from app.services.history_store import MemoryHistoryStore, SqliteHistoryStore
+from app.models.intent_router import FAST_ANSWERS
+from app.utils.data_loader import dataFingerprint, iterChunks, loadEntityTerms, loadRows
+from app.utils.metrics import span
 import logging
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+SELF_TEST_QUERIES = [
+    "¿Me recomiendas alguna referencia bibliografica del curso de tendencias de mercado?",
+    "¿Qué beneficios hay en la categoría de restaurantes?",
+    "¿Cómo puedo reservar una cancha de fútbol?",
+]
+
 class ChatbotService:
     def __init__(self, data_paths):
         logger.info("ChatbotService inicializado")
-        texts = loadAndSplitData(data_paths)
-        self.qa_model = QAModel(texts)
-        self.qa_model.test_retrieval("¿Me recomiendas alguna referencia bibliografica del curso de tendencias de mercado?")
-        self.qa_model.test_retrieval("¿Qué beneficios hay en la categoría de restaurantes?")
-        self.qa_model.test_retrieval("¿Cómo puedo reservar una cancha de fútbol?")
-        self.chat_history = {}
+        self.qa_model = QAModel(
+            iterChunks(data_paths),
+            rows=loadRows(data_paths, FAST_ANSWERS),
+            entity_terms=loadEntityTerms(data_paths),
+            data_version=dataFingerprint(data_paths)
+        )
+        if config.HISTORY_BACKEND == "sqlite":
+            self.chat_history = SqliteHistoryStore(
+                config.HISTORY_DB_PATH,
+                max_turns=config.HISTORY_MAX_TURNS,
+                max_users=config.HISTORY_MAX_USERS,
+                idle_ttl=config.HISTORY_IDLE_TTL
+            )
+        else:
+            self.chat_history = MemoryHistoryStore(
+                max_turns=config.HISTORY_MAX_TURNS,
+                max_users=config.HISTORY_MAX_USERS,
+                idle_ttl=config.HISTORY_IDLE_TTL,
+                recent_turns=config.HISTORY_RECENT_TURNS
+            )
+
+    def warmup(self):
+        # Carga el modelo de embeddings y, salvo SELF_TEST_MODE=off, verifica la
+        # recuperación; solo el modo 'full' llama al LLM
+        self.qa_model.warmup()
+        if config.SELF_TEST_MODE == "off":
+            return
+        for query in SELF_TEST_QUERIES:
+            self.qa_model.test_retrieval(query, full=config.SELF_TEST_MODE == "full")
 
     def processMessage(self, from_phone, message):
         logger.info(f"Procesando mensaje de {from_phone}: {message}")
-        if from_phone not in self.chat_history:
-            self.chat_history[from_phone] = []
 
         try:
-            answer = self.qa_model.getAnswer(message)
-            self.chat_history[from_phone].append((message, answer))
+            with span("process_message"):
+                answer = self.qa_model.getAnswer(message)
+            self.chat_history.append(from_phone, message, answer)
             logger.info(f"Respuesta generada para {from_phone}: {answer}")
             return answer
         except Exception as e:
             logger.error(f"Error al procesar mensaje: {str(e)}", exc_info=True)
             return "Lo siento, ocurrió un error al procesar tu mensaje. Por favor, intenta de nuevo."
+
+    def processMessageStream(self, from_phone, message):
+        # Generador de secciones de la respuesta; el historial guarda la respuesta completa
+        logger.info(f"Procesando mensaje de {from_phone} en streaming: {message}")
+
+        sections = []
+        try:
+            with span("process_message", streamed=True):
+                for section in self.qa_model.streamAnswer(message):
+                    sections.append(section)
+                    yield section
+            answer = "\n\n".join(sections)
+            self.chat_history.append(from_phone, message, answer)
+            logger.info(f"Respuesta generada para {from_phone} en {len(sections)} mensajes: {answer}")
+        except Exception as e:
+            logger.error(f"Error al procesar mensaje: {str(e)}", exc_info=True)
+            yield "Lo siento, ocurrió un error al procesar tu mensaje. Por favor, intenta de nuevo."
@@ -0,0 +1,195 @@
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+def compressTurns(turns):
+    return zlib.compress(json.dumps(turns, ensure_ascii=False).encode("utf-8"))
+
+def decompressTurns(blob):
+    return [tuple(turn) for turn in json.loads(zlib.decompress(blob).decode("utf-8"))]
+
+class MemoryHistoryStore:
+    # Historial acotado en memoria: como mucho max_turns por usuario y max_users
+    # usuarios (LRU), y se descartan los usuarios inactivos más de idle_ttl
+    # segundos. Solo los recent_turns últimos turnos se guardan como texto; los
+    # anteriores se comprimen en bloques zlib de block_turns turnos, así cada
+    # turno archivado solo reescribe el último bloque. Los turnos que exceden
+    # max_turns se saltan al inicio del primer bloque hasta que se descarta.
+    def __init__(self, max_turns=20, max_users=10000, idle_ttl=86400, recent_turns=4, block_turns=8):
+        self.max_turns = max_turns
+        self.max_users = max_users
+        self.idle_ttl = idle_ttl
+        self.recent_turns = max(0, min(recent_turns, max_turns))
+        self.block_turns = max(1, block_turns)
+        self.users = OrderedDict()
+        self.lock = threading.Lock()
+        self.evicted_users = 0
+        self.last_sweep = time.monotonic()
+
+    def append(self, phone, message, answer):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.users.get(phone)
+            if entry is None:
+                entry = {"recent": deque(), "blocks": deque(), "skip": 0, "archived_count": 0, "last_seen": now}
+                self.users[phone] = entry
+            self.users.move_to_end(phone)
+            entry["last_seen"] = now
+            entry["recent"].append((message, answer))
+            while len(entry["recent"]) > self.recent_turns:
+                self.archive(entry, entry["recent"].popleft())
+
+            while len(self.users) > self.max_users:
+                self.users.popitem(last=False)
+                self.evicted_users += 1
+            self.evict_idle(now)
+
+    def archive(self, entry, turn):
+        archive_limit = self.max_turns - self.recent_turns
+        if archive_limit <= 0:
+            return
+        blocks = entry["blocks"]
+        if blocks and blocks[-1][1] < self.block_turns:
+            blob, count = blocks[-1]
+            blocks[-1] = (compressTurns(decompressTurns(blob) + [turn]), count + 1)
+        else:
+            blocks.append((compressTurns([turn]), 1))
+        entry["archived_count"] += 1
+        if entry["archived_count"] > archive_limit:
+            entry["archived_count"] -= 1
+            entry["skip"] += 1
+            if entry["skip"] >= blocks[0][1]:
+                entry["skip"] -= blocks.popleft()[1]
+
+    def get(self, phone):
+        with self.lock:
+            entry = self.users.get(phone)
+            if entry is None:
+                return []
+            archived = [turn for blob, _ in entry["blocks"] for turn in decompressTurns(blob)]
+            return archived[entry["skip"]:] + list(entry["recent"])
+
+    def evict_idle(self, now):
+        # Los usuarios están ordenados por último acceso: basta revisar el inicio
+        if not self.idle_ttl or now - self.last_sweep < 60:
+            return
+        self.last_sweep = now
+        while self.users:
+            phone, entry = next(iter(self.users.items()))
+            if now - entry["last_seen"] <= self.idle_ttl:
+                break
+            self.users.popitem(last=False)
+            self.evicted_users += 1
+
+    def stats(self):
+        with self.lock:
+            turns = 0
+            size_bytes = 0
+            for phone, entry in self.users.items():
+                turns += len(entry["recent"]) + entry["archived_count"]
+                size_bytes += sys.getsizeof(phone)
+                size_bytes += sum(sys.getsizeof(message) + sys.getsizeof(answer) for message, answer in entry["recent"])
+                size_bytes += sum(len(blob) for blob, _ in entry["blocks"])
+            return {
+                "backend": "memory",
+                "users": len(self.users),
+                "turns": turns,
+                "size_bytes": size_bytes,
+                "evicted_users": self.evicted_users,
+            }
+
+class SqliteHistoryStore:
+    # Historial persistente y compartible entre workers. Cada turno se guarda
+    # comprimido; los límites por usuario, de usuarios e inactividad son los
+    # mismos que en memoria.
+    def __init__(self, db_path, max_turns=20, max_users=10000, idle_ttl=86400):
+        self.db_path = db_path
+        self.max_turns = max_turns
+        self.max_users = max_users
+        self.idle_ttl = idle_ttl
+        self.lock = threading.Lock()
+        self.last_sweep = 0.0
+        # Usuarios descartados por inactividad o por el límite desde el arranque
+        self.evicted_users = 0
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        with self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS history ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, phone TEXT NOT NULL, "
+                "created_at REAL NOT NULL, turn BLOB NOT NULL)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS history_phone ON history (phone, id)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS history_created_at ON history (created_at)")
+        logger.info(f"Historial persistente en {db_path}")
+
+    def append(self, phone, message, answer):
+        now = time.time()
+        blob = zlib.compress(json.dumps([message, answer], ensure_ascii=False).encode("utf-8"))
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO history (phone, created_at, turn) VALUES (?, ?, ?)",
+                (phone, now, blob)
+            )
+            self.connection.execute(
+                "DELETE FROM history WHERE phone = ? AND id NOT IN "
+                "(SELECT id FROM history WHERE phone = ? ORDER BY id DESC LIMIT ?)",
+                (phone, phone, self.max_turns)
+            )
+            if now - self.last_sweep >= 60:
+                self.last_sweep = now
+                self.evict(now)
+
+    def evict_phones(self, phones_query, params, reason):
+        users = self.connection.execute(f"SELECT COUNT(*) FROM ({phones_query})", params).fetchone()[0]
+        if not users:
+            return
+        cursor = self.connection.execute(f"DELETE FROM history WHERE phone IN ({phones_query})", params)
+        self.evicted_users += users
+        logger.debug(f"Historial: eliminados {users} usuarios ({cursor.rowcount} turnos) por {reason}")
+
+    def evict(self, now):
+        if self.idle_ttl:
+            self.evict_phones(
+                "SELECT phone FROM history GROUP BY phone HAVING MAX(created_at) < ?",
+                (now - self.idle_ttl,), "inactividad"
+            )
+        # LRU: se conservan los max_users usuarios con actividad más reciente
+        self.evict_phones(
+            "SELECT phone FROM history GROUP BY phone ORDER BY MAX(created_at) DESC LIMIT -1 OFFSET ?",
+            (self.max_users,), "límite de usuarios"
+        )
+
+    def get(self, phone):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT turn FROM history WHERE phone = ? ORDER BY id", (phone,)
+            ).fetchall()
+        return [tuple(json.loads(zlib.decompress(row[0]).decode("utf-8"))) for row in rows]
+
+    def stats(self):
+        with self.lock:
+            users, turns = self.connection.execute(
+                "SELECT COUNT(DISTINCT phone), COUNT(*) FROM history"
+            ).fetchone()
+            page_count = self.connection.execute("PRAGMA page_count").fetchone()[0]
+            page_size = self.connection.execute("PRAGMA page_size").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "users": users,
+            "turns": turns,
+            "size_bytes": page_count * page_size,
+            "evicted_users": self.evicted_users,
+        }
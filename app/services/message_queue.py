@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from app.utils.metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class MessageDispatcher:
+    # Una sola cola compartida por todos los workers, con orden por usuario: los
+    # mensajes de cada número esperan en su propia lista y el número entra a la
+    # cola de turnos solo cuando no hay un worker atendiéndolo. Así los mensajes
+    # de un usuario se responden en orden y una respuesta lenta solo retrasa a
+    # ese usuario, no a los que comparten worker.
+    def __init__(self, handler, num_workers=4, max_queue_size=100):
+        self.handler = handler
+        self.num_workers = num_workers
+        # Capacidad total: max_queue_size mensajes pendientes por worker
+        self.max_pending = num_workers * max_queue_size
+        self.pending = {}
+        self.pending_count = 0
+        self.turns = None
+        self.workers = []
+        self.processed = 0
+        self.rejected = 0
+        self.failed = 0
+
+    async def start(self):
+        self.turns = asyncio.Queue()
+        self.workers = [asyncio.create_task(self.worker()) for _ in range(self.num_workers)]
+        logger.info(f"Dispatcher iniciado con {self.num_workers} workers")
+
+    async def stop(self):
+        # Deja terminar los mensajes ya aceptados antes de detener los workers
+        await self.turns.join()
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        logger.info("Dispatcher detenido")
+
+    def enqueue(self, from_phone, body):
+        if self.pending_count >= self.max_pending:
+            self.rejected += 1
+            logger.warning(f"Cola llena, mensaje de {from_phone} rechazado")
+            return False
+        messages = self.pending.get(from_phone)
+        if messages is None:
+            # Usuario sin mensajes pendientes ni en curso: toma un turno
+            messages = self.pending[from_phone] = deque()
+            self.turns.put_nowait(from_phone)
+        messages.append((body, time.perf_counter()))
+        self.pending_count += 1
+        return True
+
+    async def worker(self):
+        while True:
+            from_phone = await self.turns.get()
+            messages = self.pending[from_phone]
+            body, enqueued_at = messages.popleft()
+            self.pending_count -= 1
+            STAGE_SECONDS.observe(time.perf_counter() - enqueued_at, stage="queue_wait")
+            try:
+                await self.handler(from_phone, body)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Error en el worker al procesar el mensaje de {from_phone}: {str(e)}", exc_info=True)
+            finally:
+                # El siguiente mensaje del usuario vuelve al final de la cola de turnos
+                if messages:
+                    self.turns.put_nowait(from_phone)
+                else:
+                    del self.pending[from_phone]
+                self.turns.task_done()
+
+    def stats(self):
+        return {
+            "workers": self.num_workers,
+            "queue_depth": self.pending_count,
+            "users_waiting": self.turns.qsize() if self.turns else 0,
+            "max_queue_size": self.max_pending,
+            "processed": self.processed,
+            "rejected": self.rejected,
+            "failed": self.failed,
+        }
@@ -1,22 +1,34 @@
 from twilio.rest import Client
 from twilio.base.exceptions import TwilioRestException
+from twilio.http.async_http_client import AsyncTwilioHttpClient
 from app.config import config
+from app.utils.metrics import span
 import logging
 
 logger = logging.getLogger(__name__)
 
 client = Client(config.TWILIO_ACCOUNT_SID, config.TWILIO_AUTH_TOKEN)
 
-def sendWhatsappMessage(to_phone, body_data):
+# El cliente asíncrono mantiene un pool de conexiones aiohttp, que debe crearse
+# dentro del event loop; por eso se inicializa en el primer envío
+async_http_client = None
+async_client = None
+
+def formatWhatsappNumber(to_phone):
     if to_phone.startswith('whatsapp:'): to_phone = to_phone[9:].strip()
     if not to_phone.startswith('+'): to_phone = '+' + to_phone
+    return to_phone
+
+def sendWhatsappMessage(to_phone, body_data):
+    to_phone = formatWhatsappNumber(to_phone)
     
     try:
-        message = client.messages.create(
-            from_=f'whatsapp:{config.TWILIO_PHONE_NUMBER}',
-            body=body_data,
-            to=f'whatsapp:{to_phone}'
-        )
+        with span("twilio_send"):
+            message = client.messages.create(
+                from_=f'whatsapp:{config.TWILIO_PHONE_NUMBER}',
+                body=body_data,
+                to=f'whatsapp:{to_phone}'
+            )
         
         logger.info(f"Mensaje enviado. SID: {message.sid}")
         return "Mensaje enviado correctamente"
@@ -24,3 +36,35 @@ def sendWhatsappMessage(to_phone, body_data):
     except TwilioRestException as e:
         logger.error(f"Error al enviar mensaje: {str(e)}")
         raise
+
+def getAsyncClient():
+    global async_http_client, async_client
+    if async_client is None:
+        async_http_client = AsyncTwilioHttpClient()
+        async_client = Client(config.TWILIO_ACCOUNT_SID, config.TWILIO_AUTH_TOKEN, http_client=async_http_client)
+    return async_client
+
+async def sendWhatsappMessageAsync(to_phone, body_data):
+    to_phone = formatWhatsappNumber(to_phone)
+
+    try:
+        with span("twilio_send"):
+            message = await getAsyncClient().messages.create_async(
+                from_=f'whatsapp:{config.TWILIO_PHONE_NUMBER}',
+                body=body_data,
+                to=f'whatsapp:{to_phone}'
+            )
+
+        logger.info(f"Mensaje enviado. SID: {message.sid}")
+        return "Mensaje enviado correctamente"
+
+    except TwilioRestException as e:
+        logger.error(f"Error al enviar mensaje: {str(e)}")
+        raise
+
+async def closeAsyncClient():
+    global async_http_client, async_client
+    if async_http_client is not None:
+        await async_http_client.close()
+    async_http_client = None
+    async_client = None
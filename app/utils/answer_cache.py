@@ -0,0 +1,163 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, deque
+import numpy as np
+
+def normalizeQuestion(question):
+    text = unicodedata.normalize("NFKD", question.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+ANY_SCOPE = None
+
+class AnswerCache:
+    # Dos niveles: coincidencia exacta de la pregunta normalizada y, si falla,
+    # la pregunta más parecida por similitud coseno del embedding. Las entradas
+    # se agrupan por ámbito y se invalidan al cambiar la versión del corpus
+    # indexado. Los vectores viven en una matriz preasignada (una fila por
+    # entrada), así cada búsqueda es un solo producto matriz-vector.
+    #
+    # Dos preguntas muy parecidas pueden referirse a entidades distintas ("¿qué
+    # descuento hay en X?" / "...en Y?"): una coincidencia semántica solo se
+    # acepta si ambas mencionan las mismas entidades conocidas (entity_terms) y
+    # los mismos términos con dígitos (códigos de curso, años).
+    #
+    # El ámbito es el filtro de tipo de documento con que se buscó la respuesta.
+    # get_exact acepta ANY_SCOPE para consultar antes de enrutar: la misma
+    # pregunta normalizada siempre recibe el mismo filtro.
+    def __init__(self, max_entries=1000, ttl_seconds=3600, similarity_threshold=0.95, entity_terms=()):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.entity_terms = sorted({term for term in map(normalizeQuestion, entity_terms) if len(term) >= 3})
+        self.entries = OrderedDict()
+        # Pregunta normalizada -> clave de su última entrada, para ANY_SCOPE
+        self.questions = {}
+        self.expiry = deque()
+        self.vectors = None
+        self.slot_keys = [None] * max_entries
+        self.free_slots = list(range(max_entries - 1, -1, -1))
+        self.corpus_version = None
+        self.lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.entity_mismatches = 0
+        self.misses = 0
+
+    def set_corpus_version(self, version):
+        with self.lock:
+            if version != self.corpus_version:
+                for key in list(self.entries):
+                    self.remove(key)
+                self.expiry.clear()
+                self.corpus_version = version
+
+    def entities(self, question):
+        text = f" {normalizeQuestion(question)} "
+        found = {term for term in self.entity_terms if f" {term} " in text}
+        found.update(token for token in text.split() if any(char.isdigit() for char in token))
+        return frozenset(found)
+
+    def is_expired(self, entry, now):
+        return self.ttl_seconds and now - entry["created_at"] > self.ttl_seconds
+
+    def remove(self, key):
+        entry = self.entries.pop(key)
+        if self.questions.get(key[1]) == key:
+            del self.questions[key[1]]
+        self.vectors[entry["slot"]] = 0.0
+        self.slot_keys[entry["slot"]] = None
+        self.free_slots.append(entry["slot"])
+
+    def purge_expired(self, now):
+        # expiry está en orden de creación: basta revisar el inicio
+        while self.expiry and self.ttl_seconds and now - self.expiry[0][0] > self.ttl_seconds:
+            created_at, key = self.expiry.popleft()
+            entry = self.entries.get(key)
+            if entry is not None and entry["created_at"] == created_at:
+                self.remove(key)
+
+    def get_exact(self, scope, question):
+        normalized = normalizeQuestion(question)
+        now = time.monotonic()
+        with self.lock:
+            key = self.questions.get(normalized) if scope is ANY_SCOPE else (scope, normalized)
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if self.is_expired(entry, now):
+                self.remove(key)
+                return None
+            self.entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry["answer"]
+
+    def get_similar(self, scope, question, query_vector):
+        vector = self.unit_vector(query_vector)
+        entities = self.entities(question)
+        now = time.monotonic()
+        with self.lock:
+            if self.entries:
+                scores = self.vectors @ vector
+                slots = np.flatnonzero(scores >= self.similarity_threshold)
+                for slot in slots[np.argsort(-scores[slots])]:
+                    key = self.slot_keys[slot]
+                    if key is None or key[0] != scope:
+                        continue
+                    entry = self.entries[key]
+                    if self.is_expired(entry, now):
+                        self.remove(key)
+                        continue
+                    if entry["entities"] != entities:
+                        self.entity_mismatches += 1
+                        continue
+                    self.entries.move_to_end(key)
+                    self.semantic_hits += 1
+                    return entry["answer"]
+
+            self.misses += 1
+            return None
+
+    def put(self, scope, question, query_vector, answer):
+        key = (scope, normalizeQuestion(question))
+        vector = self.unit_vector(query_vector)
+        entities = self.entities(question)
+        now = time.monotonic()
+        with self.lock:
+            self.purge_expired(now)
+            if self.vectors is None:
+                self.vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            if key in self.entries:
+                slot = self.entries[key]["slot"]
+            else:
+                if not self.free_slots:
+                    self.remove(next(iter(self.entries)))
+                slot = self.free_slots.pop()
+            self.vectors[slot] = vector
+            self.slot_keys[slot] = key
+            self.entries[key] = {"answer": answer, "slot": slot, "entities": entities, "created_at": now}
+            self.questions[key[1]] = key
+            self.entries.move_to_end(key)
+            self.expiry.append((now, key))
+
+    @staticmethod
+    def unit_vector(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def stats(self):
+        with self.lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "entity_mismatches": self.entity_mismatches,
+                "misses": self.misses,
+                "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+                "corpus_version": self.corpus_version,
+            }
@@ -1,62 +1,18 @@
 import csv
+import hashlib
+import logging
+import os
+from typing import Callable, NamedTuple, Tuple
 from langchain.schema import Document
 from langchain.text_splitter import CharacterTextSplitter
-import logging
 
 logger = logging.getLogger(__name__)
 
+text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+
 def truncateText(text, max_length=1000):
     return text[:max_length] if text else ""
 
-def loadAndSplitData(file_paths):
-    documents = []
-    
-    for file_path in file_paths:
-        documents.extend(load_csv(file_path))
-    
-    logger.info(f"Número total de documentos cargados: {len(documents)}")
-    
-    text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    texts = text_splitter.split_documents(documents)
-    
-    logger.info(f"Número de fragmentos de texto generados: {len(texts)}")
-    if texts:
-        logger.info(f"Muestra del primer fragmento:\n{texts[0].page_content[:500]}...")
-    
-    return texts
-
-def load_csv(file_path):
-    documents = []
-    with open(file_path, 'r', encoding='latin-1') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if "syllabus" in file_path.lower():
-                content = process_syllabus(row)
-                doc_type = "syllabus"
-            elif "promos" in file_path.lower():
-                content = process_promo(row)
-                doc_type = "promo"
-            elif "deportes" in file_path.lower():
-                content = process_deporte(row)
-                doc_type = "deporte"
-            elif "organizations" in file_path.lower():
-                content = process_organizations(row)
-                doc_type = "organization"
-            elif "empleos" in file_path.lower():
-                content = process_empleos(row)
-                doc_type = "empleo"
-            else:
-                logger.warning(f"Tipo de archivo desconocido: {file_path}")
-                continue
-            
-            logger.debug(f"Procesando documento de tipo {doc_type}")
-            logger.debug(f"Contenido: {content[:200]}...")  # Log the first 200 characters
-            
-            documents.append(Document(page_content=content, metadata={"source": file_path, "type": doc_type}))
-    
-    logger.info(f"Cargados {len(documents)} documentos desde {file_path}")
-    return documents
-
 def process_syllabus(row):
     # Asumiendo que el procesamiento de sílabos se mantiene igual
     return "\n".join([f"{k}: {truncateText(v)}" for k, v in row.items()])
@@ -72,19 +28,130 @@ def process_deporte(row):
            f"Tiempo de reserva: {row.get('Tiempo de reserva', 'No especificado')}\n" \
            f"Lugar: {row.get('Lugar', 'No especificado')}\n" \
            f"Link para reserva: {row.get('Link para hacer reserva', 'No especificado')}"
-           
+
 def process_organizations(row):
     # Tipo de Organizacion,Nombre de Organizacion,Correo de Organizacion,Descripcion de la Organizacion
     return f"Tipo de organización: {row.get('Tipo de Organizacion', 'No especificado')}\n" \
            f"Nombre de organización: {row.get('Nombre de Organizacion', 'No especificado')}\n" \
            f"Correo de organización: {row.get('Correo de Organizacion', 'No especificado')}\n" \
            f"Descripción de la organización: {truncateText(row.get('Descripcion de la Organizacion', ''))}"
-           
-           
+
+
 def process_empleos(row):
     # Tipo de Empresa,Tipo de Carrera,Fecha de Publicacion,Experiencia,Ingles Requerido
     return f"Tipo de Empresa: {row.get('Tipo de Empresa', 'No especificado')}\n" \
             f"Tipo de Carrera: {row.get('Tipo de Carrera', 'No especificado')}\n" \
             f"Fecha de Publicacion: {row.get('Fecha de Publicacion', 'No especificado')}\n" \
             f"Experiencia: {row.get('Experiencia', 'No especificado')}\n" \
-            f"Ingles Requerido: {row.get('Ingles Requerido', 'No especificado')}\n"
\ No newline at end of file
+            f"Ingles Requerido: {row.get('Ingles Requerido', 'No especificado')}\n"
+
+class DatasetSchema(NamedTuple):
+    doc_type: str
+    formatter: Callable
+    encoding: str
+    columns: Tuple[str, ...]
+    entities: Tuple[str, ...] = ()
+
+# Esquema de cada dataset, por nombre de archivo: tipo de documento, función que
+# convierte una fila en texto, codificación del archivo, columnas obligatorias y
+# columnas con nombres de entidades (cursos, lugares, organizaciones, empresas)
+DATASET_SCHEMAS = {
+    "syllabus_extracted.csv": DatasetSchema("syllabus", process_syllabus, "utf-8-sig", ("Curso",), ("Curso",)),
+    "promos_clean.csv": DatasetSchema("promo", process_promo, "utf-8-sig", ("Lugar", "Titulo", "Descripción"), ("Lugar",)),
+    "deportes_clean.csv": DatasetSchema("deporte", process_deporte, "utf-8-sig", ("Categoría", "Deporte", "Tiempo de reserva", "Lugar", "Link para hacer reserva"), ("Deporte",)),
+    "organized_organizations.csv": DatasetSchema("organization", process_organizations, "cp1252", ("Tipo de Organizacion", "Nombre de Organizacion", "Correo de Organizacion", "Descripcion de la Organizacion"), ("Tipo de Organizacion", "Nombre de Organizacion")),
+    "ofertas_empleo_chatbot.csv": DatasetSchema("empleo", process_empleos, "utf-8-sig", ("Tipo de Empresa", "Tipo de Carrera", "Fecha de Publicacion", "Experiencia", "Ingles Requerido"), ("Tipo de Empresa", "Tipo de Carrera")),
+}
+
+def getSchema(file_path):
+    return DATASET_SCHEMAS.get(os.path.basename(file_path))
+
+def validateDatasets(file_paths):
+    # Se revisan todos los archivos antes de empezar: ruta, esquema registrado,
+    # codificación y columnas de la cabecera. Un error aquí detiene el arranque
+    # en lugar de indexar un corpus incompleto.
+    errors = []
+    for file_path in file_paths:
+        schema = getSchema(file_path)
+        if schema is None:
+            errors.append(f"{file_path}: no hay un esquema registrado para este archivo")
+            continue
+        if not os.path.isfile(file_path):
+            errors.append(f"{file_path}: el archivo no existe")
+            continue
+        try:
+            with open(file_path, 'r', encoding=schema.encoding) as f:
+                header = next(csv.reader(f), [])
+        except UnicodeDecodeError as e:
+            errors.append(f"{file_path}: la cabecera no es {schema.encoding} válido ({e})")
+            continue
+        missing = [column for column in schema.columns if column not in header]
+        if missing:
+            errors.append(f"{file_path}: faltan las columnas {', '.join(missing)}")
+    if errors:
+        raise ValueError("Datasets inválidos:\n" + "\n".join(errors))
+
+def iterRows(file_path, schema):
+    with open(file_path, 'r', encoding=schema.encoding) as f:
+        yield from csv.DictReader(f)
+
+def iterCsvDocuments(file_path, schema):
+    count = 0
+    for row_number, row in enumerate(iterRows(file_path, schema)):
+        content = schema.formatter(row)
+        count += 1
+        yield Document(page_content=content, metadata={"source": file_path, "type": schema.doc_type, "row": row_number})
+    logger.info(f"Cargados {count} documentos desde {file_path}")
+
+def loadRows(file_paths, doc_types):
+    # Filas en memoria de los datasets pequeños, agrupadas por tipo de documento
+    rows = {}
+    for file_path in file_paths:
+        schema = getSchema(file_path)
+        if schema is not None and schema.doc_type in doc_types:
+            rows.setdefault(schema.doc_type, []).extend(iterRows(file_path, schema))
+    return rows
+
+def loadEntityTerms(file_paths):
+    # Nombres de entidades de todos los datasets, para distinguir preguntas
+    # parecidas que hablan de cosas distintas
+    terms = set()
+    for file_path in file_paths:
+        schema = getSchema(file_path)
+        if schema is None or not schema.entities:
+            continue
+        for row in iterRows(file_path, schema):
+            terms.update((row.get(column) or "").strip() for column in schema.entities)
+    terms.discard("")
+    return terms
+
+def dataFingerprint(file_paths):
+    # Huella del contenido de los datasets: si no cambia, no hace falta volver a
+    # sincronizar el índice de vectores
+    digest = hashlib.sha256()
+    for file_path in file_paths:
+        digest.update(os.path.basename(file_path).encode("utf-8"))
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+def iterDocuments(file_paths):
+    for file_path in file_paths:
+        yield from iterCsvDocuments(file_path, getSchema(file_path))
+
+def iterChunks(file_paths):
+    # Valida los datasets de inmediato y devuelve un generador: cada fila se
+    # lee, se convierte y se divide en fragmentos a medida que se consume, sin
+    # tener todo el corpus en memoria
+    validateDatasets(file_paths)
+    return generateChunks(file_paths)
+
+def generateChunks(file_paths):
+    for document in iterDocuments(file_paths):
+        yield from text_splitter.split_documents([document])
+
+def loadAndSplitData(file_paths):
+    texts = list(iterChunks(file_paths))
+    logger.info(f"Número de fragmentos de texto generados: {len(texts)}")
+    return texts
@@ -0,0 +1,55 @@
+import functools
+import logging
+from langchain_huggingface import HuggingFaceEmbeddings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Modelo ONNX cuantizado a int8 que sentence-transformers publica junto a
+# all-mpnet-base-v2; para otros modelos se indica con EMBEDDING_ONNX_FILE
+DEFAULT_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+
+def onnxFileName(backend, onnx_file=""):
+    if onnx_file:
+        return onnx_file
+    return DEFAULT_INT8_FILE if backend == "onnx-int8" else ""
+
+# Modelo y backend con los que se crearon los índices antes de identificar los
+# vectores: sus IDs de puntos no incluyen la identidad, para no reindexarlos
+LEGACY_EMBEDDING_IDENTITY = "sentence-transformers/all-mpnet-base-v2"
+
+def embeddingIdentity(model_name, backend="torch", onnx_file=""):
+    # Identifica los vectores que produce el backend: PyTorch conserva el nombre
+    # del modelo y los backends ONNX añaden su variante, porque sus vectores
+    # difieren ligeramente
+    if backend == "torch":
+        return model_name
+    file_name = onnxFileName(backend, onnx_file)
+    return f"{model_name}@{backend}" + (f":{file_name}" if file_name else "")
+
+# Una sola instancia por configuración en el proceso: si el maestro la crea antes
+# del fork (PRELOAD_MODEL), los workers heredan los pesos ya cargados
+@functools.lru_cache(maxsize=None)
+def createEmbeddings(model_name, backend="torch", threads=0, onnx_file=""):
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Backend de embeddings desconocido: {backend} (opciones: {', '.join(EMBEDDING_BACKENDS)})")
+
+    model_kwargs = {"device": "cpu"}
+    if backend == "torch":
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+    else:
+        import onnxruntime
+        session_options = onnxruntime.SessionOptions()
+        if threads:
+            session_options.intra_op_num_threads = threads
+        onnx_kwargs = {"provider": "CPUExecutionProvider", "session_options": session_options}
+        file_name = onnxFileName(backend, onnx_file)
+        if file_name:
+            onnx_kwargs["file_name"] = file_name
+        model_kwargs.update(backend="onnx", model_kwargs=onnx_kwargs)
+
+    logger.info(f"Cargando modelo de embeddings {embeddingIdentity(model_name, backend, onnx_file)} ({threads or 'auto'} hilos)")
+    return HuggingFaceEmbeddings(model_name=model_name, model_kwargs=model_kwargs)
@@ -0,0 +1,90 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+class BatchingEmbeddings(Embeddings):
+    # Agrupa las llamadas concurrentes a embed_query: un hilo recoge consultas
+    # durante max_wait_ms o hasta max_batch_size y las pasa al modelo en un solo
+    # embed_documents. La ingesta (embed_documents) ya llega en lotes y pasa directo.
+    def __init__(self, embeddings, max_batch_size=32, max_wait_ms=5):
+        self.embeddings = embeddings
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.lock = threading.Lock()
+        self.queue = None
+        self.thread = None
+        self.pid = None
+
+        self.batches = 0
+        self.queries = 0
+        self.largest_batch = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        future = Future()
+        self.get_queue().put((text, future, time.monotonic()))
+        return future.result()
+
+    def get_queue(self):
+        # El hilo se crea en el primer uso y se recrea tras un fork, donde no sobrevive
+        with self.lock:
+            if self.thread is None or self.pid != os.getpid():
+                self.queue = queue.Queue()
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self.run, args=(self.queue,), name="embedding-batcher", daemon=True)
+                self.thread.start()
+            return self.queue
+
+    def run(self, requests):
+        while True:
+            batch = [requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            started = time.monotonic()
+            try:
+                vectors = self.embeddings.embed_documents([text for text, _, _ in batch])
+                for (_, future, _), vector in zip(batch, vectors):
+                    future.set_result(vector)
+            except Exception as e:
+                logger.error(f"Error al calcular el lote de {len(batch)} embeddings: {e}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+
+            with self.lock:
+                self.batches += 1
+                self.queries += len(batch)
+                self.largest_batch = max(self.largest_batch, len(batch))
+                for _, _, enqueued_at in batch:
+                    wait = started - enqueued_at
+                    self.total_wait += wait
+                    self.max_wait_seen = max(self.max_wait_seen, wait)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "batches": self.batches,
+                "queries": self.queries,
+                "avg_batch_size": self.queries / self.batches if self.batches else 0.0,
+                "max_batch_size": self.largest_batch,
+                "avg_queue_wait_ms": 1000.0 * self.total_wait / self.queries if self.queries else 0.0,
+                "max_queue_wait_ms": 1000.0 * self.max_wait_seen,
+                "queue_depth": self.queue.qsize() if self.queue else 0,
+            }
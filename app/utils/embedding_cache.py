@@ -0,0 +1,281 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import portalocker
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+def textKey(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    # Almacén en disco de solo anexado:
+    #   meta.json    -> modelo, tipo de dato, dimensión y generación de los archivos
+    #   keys.txt     -> un sha256 por línea; la línea N corresponde a la fila N
+    #   vectors.bin  -> matriz contigua de vectores, leída con np.memmap
+    # Las escrituras se serializan con un lock de archivo para que varios
+    # procesos o réplicas puedan compartir el mismo directorio. Al superar
+    # max_entries se compacta: se conservan las filas más recientes en archivos
+    # de una nueva generación (keys.N.txt, vectors.N.bin) y meta.json, reemplazado
+    # de forma atómica, pasa a apuntar a ellos.
+    def __init__(self, cache_dir, model_name, dtype="float16", max_entries=100000):
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.dtype = np.dtype(dtype)
+        self.max_entries = max_entries
+        self.meta_path = os.path.join(cache_dir, "meta.json")
+        self.lock_path = os.path.join(cache_dir, ".lock")
+
+        self.lock = threading.RLock()
+        self.generation = 0
+        self.compactions = 0
+        self.index = {}
+        self.rows = 0
+        self.keys_offset = 0
+        self.dim = None
+        self.vectors = None
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        with self.file_lock():
+            self.check_meta()
+        self.refresh()
+        logger.info(f"Caché de embeddings en {cache_dir}: {self.rows} vectores para {model_name}")
+
+    def file_lock(self):
+        return portalocker.Lock(self.lock_path, mode="a", timeout=60)
+
+    def data_paths(self, generation):
+        # La generación 0 conserva los nombres originales de los archivos
+        suffix = f".{generation}" if generation else ""
+        return (os.path.join(self.cache_dir, f"keys{suffix}.txt"),
+                os.path.join(self.cache_dir, f"vectors{suffix}.bin"))
+
+    @property
+    def keys_path(self):
+        return self.data_paths(self.generation)[0]
+
+    @property
+    def vectors_path(self):
+        return self.data_paths(self.generation)[1]
+
+    def read_meta(self):
+        if not os.path.exists(self.meta_path):
+            return None
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def write_meta(self):
+        meta = {"model_name": self.model_name, "dtype": self.dtype.name, "dim": self.dim, "generation": self.generation}
+        with open(self.meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(self.meta_path + ".tmp", self.meta_path)
+
+    def remove_stale_files(self):
+        # Archivos de generaciones anteriores o de una compactación interrumpida
+        current = set(self.data_paths(self.generation))
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if (name.startswith("keys") or name.startswith("vectors")) and path not in current:
+                os.remove(path)
+
+    def check_meta(self):
+        meta = self.read_meta()
+        if meta and meta.get("model_name") == self.model_name and meta.get("dtype") == self.dtype.name:
+            self.dim = meta.get("dim")
+            self.generation = meta.get("generation", 0)
+            self.remove_stale_files()
+            return
+
+        if meta:
+            logger.info(f"Modelo de la caché cambió ({meta.get('model_name')} -> {self.model_name}), descartando entradas")
+        self.generation = meta.get("generation", 0) + 1 if meta else 0
+        self.dim = None
+        self.write_meta()
+        self.remove_stale_files()
+
+    def reset_index(self):
+        self.index = {}
+        self.rows = 0
+        self.keys_offset = 0
+        self.vectors = None
+
+    def refresh(self):
+        with self.lock:
+            meta = self.read_meta() or {}
+            if meta.get("generation", 0) != self.generation:
+                # Otro proceso compactó la caché o la vació por cambio de modelo
+                self.generation = meta.get("generation", 0)
+                self.dim = meta.get("dim")
+                self.reset_index()
+            if not os.path.exists(self.keys_path):
+                self.reset_index()
+                return
+            if os.path.getsize(self.keys_path) < self.keys_offset:
+                # Otro proceso vació la caché (p. ej. por cambio de modelo)
+                self.reset_index()
+
+            try:
+                with open(self.keys_path, "rb") as f:
+                    f.seek(self.keys_offset)
+                    data = f.read()
+            except FileNotFoundError:
+                # Compactación en curso en otro proceso: se relee en la próxima llamada
+                self.reset_index()
+                return
+            complete = data[:data.rfind(b"\n") + 1]
+            if not complete and self.vectors is not None:
+                return
+
+            for line in complete.decode("ascii").splitlines():
+                self.index[line] = self.rows
+                self.rows += 1
+            self.keys_offset += len(complete)
+
+            if self.dim is None:
+                meta = self.read_meta() or {}
+                self.dim = meta.get("dim")
+            if self.rows and self.dim:
+                self.vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode="r", shape=(self.rows, self.dim))
+
+    def get_many(self, keys):
+        with self.lock:
+            if any(key not in self.index for key in keys):
+                self.refresh()
+            found = {}
+            for key in keys:
+                row = self.index.get(key)
+                if row is not None:
+                    found[key] = np.asarray(self.vectors[row], dtype=np.float32)
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+            return found
+
+    def put_many(self, keys, vectors):
+        with self.lock, self.file_lock():
+            self.refresh()
+            new_rows = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self.index:
+                    new_rows[key] = vector
+            if not new_rows:
+                return
+
+            matrix = np.asarray(list(new_rows.values()), dtype=self.dtype)
+            if self.dim is None:
+                self.dim = matrix.shape[1]
+                self.write_meta()
+
+            # Descarta vectores huérfanos de una escritura interrumpida para que
+            # las filas sigan alineadas con keys.txt
+            row_bytes = self.dim * self.dtype.itemsize
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(self.rows * row_bytes)
+                f.write(matrix.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.keys_path, "a", encoding="ascii") as f:
+                f.write("".join(f"{key}\n" for key in new_rows))
+                f.flush()
+            self.refresh()
+            if self.max_entries and self.rows > self.max_entries:
+                self.compact(self.max_entries * 3 // 4)
+
+    def compact(self, keep):
+        # Se llama con los dos locks tomados. Las filas más recientes están al final
+        keys = sorted(self.index, key=self.index.get)[-keep:]
+        matrix = np.asarray(self.vectors[self.rows - len(keys):])
+        generation = self.generation + 1
+        keys_path, vectors_path = self.data_paths(generation)
+        with open(vectors_path, "wb") as f:
+            f.write(matrix.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(keys_path, "w", encoding="ascii") as f:
+            f.write("".join(f"{key}\n" for key in keys))
+            f.flush()
+            os.fsync(f.fileno())
+        previous = self.rows
+        self.generation = generation
+        self.write_meta()
+        self.remove_stale_files()
+        self.reset_index()
+        self.refresh()
+        self.compactions += 1
+        logger.info(f"Caché de embeddings compactada: {previous} -> {self.rows} vectores")
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": self.rows,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size_bytes": os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0,
+            "max_entries": self.max_entries,
+            "compactions": self.compactions,
+        }
+
+class CachedEmbeddings(Embeddings):
+    # Solo los vectores de documentos se guardan en disco. Las consultas de los
+    # usuarios casi nunca se repiten: van a un LRU en memoria acotado, sin
+    # escrituras ni locks de archivo en la ruta de cada pregunta
+    def __init__(self, embeddings, cache, query_cache_size=1000):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.query_cache_size = query_cache_size
+        self.queries = OrderedDict()
+        self.query_lock = threading.Lock()
+        self.query_hits = 0
+        self.query_misses = 0
+
+    def embed_documents(self, texts):
+        keys = [textKey(text) for text in texts]
+        found = self.cache.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        if missing:
+            computed = self.embeddings.embed_documents(list(missing.values()))
+            self.cache.put_many(list(missing.keys()), computed)
+            for key, vector in zip(missing.keys(), computed):
+                found[key] = np.asarray(vector, dtype=np.float32)
+
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text):
+        key = textKey(text)
+        with self.query_lock:
+            vector = self.queries.get(key)
+            if vector is not None:
+                self.queries.move_to_end(key)
+                self.query_hits += 1
+                return list(vector)
+            self.query_misses += 1
+
+        vector = list(self.embeddings.embed_query(text))
+        if self.query_cache_size > 0:
+            with self.query_lock:
+                self.queries[key] = vector
+                while len(self.queries) > self.query_cache_size:
+                    self.queries.popitem(last=False)
+        return list(vector)
+
+    def query_stats(self):
+        with self.query_lock:
+            total = self.query_hits + self.query_misses
+            return {
+                "entries": len(self.queries),
+                "max_entries": self.query_cache_size,
+                "hits": self.query_hits,
+                "misses": self.query_misses,
+                "hit_rate": self.query_hits / total if total else 0.0,
+            }
@@ -0,0 +1,59 @@
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+import portalocker
+
+logger = logging.getLogger(__name__)
+
+class IndexLock:
+    # Con varios workers, solo un proceso a la vez sincroniza el índice: los
+    # demás esperan el lock y, cuando lo obtienen, el índice ya está al día y su
+    # sincronización no embebe ni borra nada. El marcador guarda la versión del
+    # corpus indexada, la de los datos de origen, el despliegue y cuándo se
+    # escribió.
+    def __init__(self, lock_path, marker_path, timeout=1800):
+        self.lock_path = lock_path
+        self.marker_path = marker_path
+        self.timeout = timeout
+        for path in (lock_path, marker_path):
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def exclusive(self):
+        lock = portalocker.Lock(self.lock_path, mode="a", timeout=0, fail_when_locked=True)
+        try:
+            lock.acquire()
+        except portalocker.exceptions.LockException:
+            logger.info(f"Otro proceso está sincronizando el índice, esperando (hasta {self.timeout}s)")
+            started = time.monotonic()
+            lock = portalocker.Lock(self.lock_path, mode="a", timeout=self.timeout)
+            lock.acquire()
+            logger.info(f"Lock del índice obtenido tras {time.monotonic() - started:.1f}s")
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def read_marker(self):
+        try:
+            with open(self.marker_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_marker(self, corpus_version, points, source_version=None, deploy_id=""):
+        marker = {
+            "corpus_version": corpus_version,
+            "points": points,
+            "source_version": source_version,
+            "deploy_id": deploy_id,
+            "updated_at": time.time(),
+            "pid": os.getpid(),
+        }
+        with open(self.marker_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(marker, f)
+        os.replace(self.marker_path + ".tmp", self.marker_path)
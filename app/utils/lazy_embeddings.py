@@ -0,0 +1,33 @@
+import logging
+import threading
+import time
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+class LazyEmbeddings(Embeddings):
+    # Difiere la carga del modelo hasta el primer embedding (o hasta load()).
+    # Con la caché y el índice ya sincronizados el arranque no necesita el modelo.
+    def __init__(self, factory):
+        self.factory = factory
+        self.embeddings = None
+        self.lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self.embeddings is not None
+
+    def load(self):
+        if self.embeddings is None:
+            with self.lock:
+                if self.embeddings is None:
+                    started = time.monotonic()
+                    self.embeddings = self.factory()
+                    logger.info(f"Modelo de embeddings cargado en {time.monotonic() - started:.1f}s")
+        return self.embeddings
+
+    def embed_documents(self, texts):
+        return self.load().embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.load().embed_query(text)
@@ -0,0 +1,50 @@
+def cutPoint(text, max_chars):
+    # Mejor corte dentro de max_chars: fin de párrafo, de línea, de oración o espacio
+    window = text[:max_chars]
+    for separator in ("\n\n", "\n", ". ", " "):
+        index = window.rfind(separator)
+        if index > 0:
+            return index + len(separator)
+    return max_chars
+
+def splitMessage(text, max_chars=1600):
+    # Divide una respuesta en mensajes que respetan el límite de WhatsApp
+    parts = []
+    text = text.strip()
+    while len(text) > max_chars:
+        cut = cutPoint(text, max_chars)
+        parts.append(text[:cut].strip())
+        text = text[cut:].strip()
+    if text:
+        parts.append(text)
+    return parts
+
+class SectionStream:
+    # Acumula los tokens que llegan del LLM y entrega cada sección en cuanto se
+    # completa: se corta en un salto de párrafo cuando ya hay al menos min_chars,
+    # y antes si el texto acumulado supera max_chars.
+    def __init__(self, min_chars=300, max_chars=1600):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.buffer = ""
+
+    def feed(self, text):
+        self.buffer += text
+        sections = []
+        while True:
+            if len(self.buffer) > self.max_chars:
+                cut = cutPoint(self.buffer, self.max_chars)
+            else:
+                index = self.buffer.rfind("\n\n")
+                if index < self.min_chars:
+                    break
+                cut = index + 2
+            section = self.buffer[:cut].strip()
+            self.buffer = self.buffer[cut:]
+            if section:
+                sections.append(section)
+        return sections
+
+    def flush(self):
+        text, self.buffer = self.buffer, ""
+        return splitMessage(text, self.max_chars)
@@ -0,0 +1,151 @@
+import contextvars
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def formatLabels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+class Counter:
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1.0, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{formatLabels(key)} {value}")
+        return lines
+
+class Gauge(Counter):
+    def set(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = float(value)
+
+    def render(self):
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+class Histogram:
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                series = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self.values[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, series in sorted(self.values.items()):
+                for bound, count in zip(self.buckets, series["counts"]):
+                    lines.append(f"{self.name}_bucket{formatLabels(key + (('le', bound),))} {count}")
+                lines.append(f"{self.name}_bucket{formatLabels(key + (('le', '+Inf'),))} {series['count']}")
+                lines.append(f"{self.name}_sum{formatLabels(key)} {series['sum']}")
+                lines.append(f"{self.name}_count{formatLabels(key)} {series['count']}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation):
+        return self.register(Counter(name, documentation))
+
+    def gauge(self, name, documentation):
+        return self.register(Gauge(name, documentation))
+
+    def histogram(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram("mindtec_stage_seconds", "Duración de cada etapa del procesamiento de un mensaje")
+REQUEST_SECONDS = registry.histogram("mindtec_request_seconds", "Duración total del procesamiento de un mensaje")
+ANSWER_CACHE_LOOKUPS = registry.counter("mindtec_answer_cache_lookups_total", "Consultas a la caché de respuestas por resultado")
+LLM_TOKENS = registry.counter("mindtec_llm_tokens_total", "Tokens consumidos por el LLM por tipo")
+RETRIEVED_CHUNKS = registry.histogram("mindtec_retrieved_chunks", "Fragmentos recuperados por pregunta", buckets=(0, 1, 2, 3, 5, 8, 13, 21))
+COALESCED_REQUESTS = registry.counter("mindtec_coalesced_requests_total", "Preguntas que compartieron la respuesta de una idéntica en curso")
+SLOW_REQUESTS = registry.counter("mindtec_slow_requests_total", "Mensajes que superaron el umbral de lentitud")
+INTENT_ROUTES = registry.counter("mindtec_intent_routes_total", "Preguntas por intención detectada y camino de respuesta (fast o llm)")
+INTENT_CONFIDENCE = registry.histogram("mindtec_intent_confidence", "Similitud de la pregunta con el centroide de la intención elegida", buckets=(0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9))
+
+# Traza del mensaje en curso; asyncio.to_thread copia el contexto, así que las
+# etapas ejecutadas en hilos se registran en la misma traza
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+@contextmanager
+def span(stage, **attributes):
+    started = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        duration = time.perf_counter() - started
+        STAGE_SECONDS.observe(duration, stage=stage)
+        trace = current_trace.get()
+        if trace is not None:
+            trace["spans"].append({
+                "stage": stage,
+                "start_ms": round(1000.0 * (started - trace["started"]), 2),
+                "duration_ms": round(1000.0 * duration, 2),
+                **attributes,
+            })
+
+@contextmanager
+def trace(name, slow_threshold=0.0, sample_rate=1.0, **attributes):
+    # Si el mensaje tarda más que slow_threshold se registra la traza completa
+    # (con probabilidad sample_rate) para poder ver qué etapa consumió el tiempo
+    data = {"name": name, "started": time.perf_counter(), "spans": [], **attributes}
+    token = current_trace.set(data)
+    try:
+        yield data
+    finally:
+        current_trace.reset(token)
+        duration = time.perf_counter() - data["started"]
+        REQUEST_SECONDS.observe(duration, name=name)
+        if slow_threshold and duration >= slow_threshold:
+            SLOW_REQUESTS.inc(name=name)
+            if random.random() < sample_rate:
+                spans = json.dumps(data["spans"], ensure_ascii=False, default=str)
+                logger.warning(f"Mensaje lento ({1000.0 * duration:.0f}ms) {name} {attributes}: {spans}")
@@ -0,0 +1,77 @@
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from app.utils.metrics import COALESCED_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    # Agrupa las llamadas concurrentes con la misma clave: la primera (líder)
+    # calcula el resultado y las demás esperan y lo comparten. La clave se libera
+    # al terminar, también si el líder falla o se interrumpe, así que solo se
+    # agrupan las llamadas simultáneas. Un seguidor espera como mucho timeout
+    # segundos y luego calcula el resultado por su cuenta.
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def begin(self, key):
+        with self.lock:
+            future = self.calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                COALESCED_REQUESTS.inc()
+                return future, False
+            future = Future()
+            self.calls[key] = future
+            self.leaders += 1
+            return future, True
+
+    def finish(self, key, future, result=None, error=None):
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+        with self.lock:
+            if self.calls.get(key) is future:
+                del self.calls[key]
+
+    def wait(self, future):
+        # Resultado del líder, o None si no llegó a tiempo
+        try:
+            return future.result(timeout=self.timeout), True
+        except FutureTimeoutError:
+            with self.lock:
+                self.timeouts += 1
+            logger.warning(f"La respuesta compartida no llegó en {self.timeout}s, se calcula por separado")
+            return None, False
+
+    def do(self, key, function):
+        future, leader = self.begin(key)
+        if not leader:
+            result, ready = self.wait(future)
+            return result if ready else function()
+        try:
+            result = function()
+        except BaseException as e:
+            # KeyboardInterrupt o SystemExit se propagan solo en el hilo líder;
+            # los seguidores reciben un error normal
+            if not isinstance(e, Exception):
+                e = RuntimeError("La llamada que calculaba la respuesta se interrumpió")
+            self.finish(key, future, error=e)
+            raise
+        self.finish(key, future, result=result)
+        return result
+
+    def stats(self):
+        with self.lock:
+            return {
+                "in_flight": len(self.calls),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "timeouts": self.timeouts,
+            }
@@ -0,0 +1,109 @@
+import argparse
+import json
+import random
+import time
+import numpy as np
+
+# Compara un backend de embeddings (ONNX, ONNX int8, otros hilos) con el modelo
+# PyTorch fp32 de referencia sobre el corpus y preguntas generadas de los CSV:
+#
+#   python -m benchmarks.embedding_recall --backend onnx-int8 --threads 4
+#
+# recall@k: fracción de los k documentos que recupera la referencia que también
+# recupera el backend, con el índice reconstruido con el backend ("reindexed") y
+# con consultas del backend contra el índice fp32 existente ("mixed").
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description="Recall de un backend de embeddings frente al modelo fp32")
+    parser.add_argument("--model", default="sentence-transformers/all-mpnet-base-v2")
+    parser.add_argument("--backend", default="onnx-int8", help="torch, onnx u onnx-int8")
+    parser.add_argument("--onnx-file", default="", help="archivo ONNX dentro del repositorio del modelo")
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--max-documents", type=int, default=0, help="limita el corpus (0 = completo)")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="archivo JSON de salida (por defecto stdout)")
+    return parser.parse_args()
+
+def embedAll(embeddings, texts, batch_size):
+    vectors = []
+    started = time.perf_counter()
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(embeddings.embed_documents(texts[start:start + batch_size]))
+    elapsed = time.perf_counter() - started
+    matrix = np.asarray(vectors, dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    return matrix, elapsed
+
+def queryLatencies(embeddings, queries):
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        embeddings.embed_query(query)
+        latencies.append(time.perf_counter() - started)
+    ordered = sorted(latencies)
+    return {
+        "p50_ms": 1000.0 * ordered[len(ordered) // 2],
+        "p95_ms": 1000.0 * ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+    }
+
+def topK(query_matrix, document_matrix, k):
+    scores = query_matrix @ document_matrix.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+def recallAtK(reference, candidate):
+    return float(np.mean([len(set(ref) & set(cand)) / len(ref) for ref, cand in zip(reference, candidate)]))
+
+def main():
+    args = parseArgs()
+    import logging
+    logging.disable(logging.INFO)
+
+    from app.utils.data_loader import loadAndSplitData
+    from app.utils.embedding_backend import createEmbeddings
+    from benchmarks.run_benchmark import DATA_PATHS, buildQuestions
+
+    rng = random.Random(args.seed)
+    documents = list(dict.fromkeys(text.page_content for text in loadAndSplitData(DATA_PATHS)))
+    if args.max_documents:
+        documents = rng.sample(documents, min(args.max_documents, len(documents)))
+    queries = buildQuestions(args.queries, rng)
+
+    reference = createEmbeddings(args.model, backend="torch", threads=args.threads)
+    candidate = createEmbeddings(args.model, backend=args.backend, threads=args.threads, onnx_file=args.onnx_file)
+
+    reference_documents, reference_seconds = embedAll(reference, documents, args.batch_size)
+    candidate_documents, candidate_seconds = embedAll(candidate, documents, args.batch_size)
+    reference_queries, _ = embedAll(reference, queries, args.batch_size)
+    candidate_queries, _ = embedAll(candidate, queries, args.batch_size)
+
+    expected = topK(reference_queries, reference_documents, args.k)
+    report = {
+        "args": vars(args),
+        "documents": len(documents),
+        "queries": len(queries),
+        "dimension": int(candidate_documents.shape[1]),
+        f"recall@{args.k}_reindexed": recallAtK(expected, topK(candidate_queries, candidate_documents, args.k)),
+        f"recall@{args.k}_mixed": recallAtK(expected, topK(candidate_queries, reference_documents, args.k)),
+        "mean_cosine_to_reference": float(np.mean(np.sum(reference_documents * candidate_documents, axis=1))),
+        "reference": {
+            "documents_per_s": len(documents) / reference_seconds if reference_seconds else 0.0,
+            "query_latency": queryLatencies(reference, queries[:50]),
+        },
+        "candidate": {
+            "documents_per_s": len(documents) / candidate_seconds if candidate_seconds else 0.0,
+            "query_latency": queryLatencies(candidate, queries[:50]),
+        },
+    }
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import asyncio
+import hashlib
+import re
+import time
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+# Dobles locales de los servicios externos (OpenAI, Twilio) y del modelo de
+# embeddings, con latencias configurables para medir el resto del sistema.
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+class FakeEmbeddings(Embeddings):
+    # Vectores deterministas por hashing de palabras: misma dimensión que mpnet
+    # y textos parecidos producen vectores parecidos
+    def __init__(self, model_name=None, dim=768, latency_ms=0.0, per_item_ms=0.0, **kwargs):
+        self.model_name = model_name
+        self.dim = dim
+        self.latency = latency_ms / 1000.0
+        self.per_item = per_item_ms / 1000.0
+        self.calls = 0
+
+    def vector(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dim] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        time.sleep(self.latency + self.per_item * len(texts))
+        return [self.vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+class FakeLLM:
+    # Imita la interfaz de ChatOpenAI usada por QAModel (invoke y stream sobre
+    # una lista de mensajes): latencia hasta el primer token, latencia por token
+    # y número de tokens de salida configurables
+    def __init__(self, first_token_ms=300.0, per_token_ms=10.0, output_tokens=120, **kwargs):
+        self.first_token = first_token_ms / 1000.0
+        self.per_token = per_token_ms / 1000.0
+        self.output_tokens = output_tokens
+        self.calls = 0
+        self.prompt_chars = 0
+
+    def tokens(self):
+        words = ["*Información", "solicitada", "-", "detalle", "relevante", "del", "contexto", "para", "el", "estudiante."]
+        for i in range(self.output_tokens):
+            token = words[i % len(words)]
+            # Un párrafo cada 40 tokens para que la salida tenga secciones
+            yield token + ("\n\n" if i % 40 == 39 else " ")
+
+    def prompt_size(self, prompt):
+        return sum(len(getattr(message, "content", str(message))) for message in prompt)
+
+    def usage(self, prompt):
+        return {
+            "input_tokens": self.prompt_size(prompt) // 4,
+            "output_tokens": self.output_tokens,
+            "total_tokens": self.prompt_size(prompt) // 4 + self.output_tokens,
+        }
+
+    def invoke(self, prompt, **kwargs):
+        self.calls += 1
+        self.prompt_chars += self.prompt_size(prompt)
+        time.sleep(self.first_token + self.per_token * self.output_tokens)
+        return AIMessage(content="".join(self.tokens()).strip(), usage_metadata=self.usage(prompt))
+
+    def stream(self, prompt, **kwargs):
+        self.calls += 1
+        self.prompt_chars += self.prompt_size(prompt)
+        time.sleep(self.first_token)
+        for token in self.tokens():
+            time.sleep(self.per_token)
+            yield AIMessageChunk(content=token)
+        yield AIMessageChunk(content="", usage_metadata=self.usage(prompt))
+
+class FakeTwilio:
+    # Registra cada envío con su marca de tiempo en lugar de llamar a Twilio
+    def __init__(self, latency_ms=50.0):
+        self.latency = latency_ms / 1000.0
+        self.sent = []
+        self.listeners = {}
+
+    def wait_for(self, to_phone):
+        future = asyncio.get_running_loop().create_future()
+        self.listeners[to_phone] = future
+        return future
+
+    async def send(self, to_phone, body_data):
+        await asyncio.sleep(self.latency)
+        self.sent.append((to_phone, body_data, time.perf_counter()))
+        listener = self.listeners.pop(to_phone, None)
+        if listener is not None and not listener.done():
+            listener.set_result(time.perf_counter())
+        return "Mensaje enviado correctamente"
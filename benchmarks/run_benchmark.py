@@ -0,0 +1,361 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+# Benchmark offline de MindTEC: OpenAI, Twilio, Qdrant y (por defecto) el modelo
+# de embeddings se sustituyen por dobles locales de benchmarks/fakes.py.
+#
+#   python -m benchmarks.run_benchmark --requests 200 --concurrency 16 --output bench.json
+
+DATA_PATHS = [
+    "./app/data/syllabus_extracted.csv",
+    "./app/data/promos_clean.csv",
+    "./app/data/deportes_clean.csv",
+    "./app/data/organized_organizations.csv",
+    "./app/data/ofertas_empleo_chatbot.csv",
+]
+
+QUESTION_TEMPLATES = {
+    "syllabus_extracted.csv": ("Curso", [
+        "¿Me recomiendas alguna referencia bibliografica del curso de {}?",
+        "¿Cuántos créditos tiene el curso {}?",
+        "¿Cómo es el sistema de evaluación de {}?",
+    ]),
+    "promos_clean.csv": ("Lugar", [
+        "¿Qué descuento tienen los estudiantes en {}?",
+        "¿Hasta cuándo es válida la promoción de {}?",
+    ]),
+    "deportes_clean.csv": ("Deporte", [
+        "¿Cómo puedo reservar {} en la universidad?",
+        "¿Dónde se juega {} y cuánto dura la reserva?",
+    ]),
+    "organized_organizations.csv": ("Nombre de Organizacion", [
+        "¿Cuál es el correo de la organización {}?",
+        "¿Qué actividades realiza {}?",
+    ]),
+    "ofertas_empleo_chatbot.csv": ("Tipo de Empresa", [
+        "¿Qué ofertas de empleo tiene {}?",
+        "¿Piden inglés para trabajar en {}?",
+    ]),
+}
+
+GENERIC_QUESTIONS = [
+    "¿Qué promociones hay para estudiantes de la universidad?",
+    "¿Qué beneficios hay en la categoría de restaurantes?",
+    "¿Cómo puedo reservar una cancha de fútbol?",
+    "¿Qué organizaciones estudiantiles existen en UTEC?",
+]
+
+# Preguntas para medir el enrutado, redactadas aparte de QUESTION_TEMPLATES y
+# de los ejemplos de INTENTS (app/models/intent_router.py): los centroides se
+# construyen con esos ejemplos y medir sobre ellos inflaría la precisión
+ROUTING_TEMPLATES = {
+    "syllabus_extracted.csv": [
+        "¿Qué libros usan en {}?",
+        "¿Cuánto vale el examen final de {}?",
+        "¿Quién dicta {} y en qué horario?",
+    ],
+    "promos_clean.csv": [
+        "¿{} tiene alguna oferta para alumnos?",
+        "¿Cuánto me ahorro si compro en {} con mi carnet?",
+    ],
+    "deportes_clean.csv": [
+        "Quiero separar un horario para jugar {}",
+        "¿En qué parte del campus se practica {}?",
+    ],
+    "organized_organizations.csv": [
+        "¿Cómo me uno a {}?",
+        "Quiero información de contacto de {}",
+    ],
+    "ofertas_empleo_chatbot.csv": [
+        "¿{} está contratando practicantes?",
+        "¿Qué requisitos piden en {} para postular?",
+    ],
+}
+
+ROUTING_GENERIC = [
+    ("¿Qué rebajas tienen los alumnos este mes?", "promo_lista"),
+    ("¿Hay canchas libres para separar hoy?", "deporte_lista"),
+    ("¿Qué clubes estudiantiles puedo integrar?", "organizacion_lista"),
+    ("¿Dónde encuentro trabajos de medio tiempo para universitarios?", "empleo_lista"),
+    ("¿Cómo repaso para un parcial en pocos días?", "general"),
+]
+
+# Intención esperada de cada pregunta, para medir la precisión del enrutado
+INTENT_LABELS = {
+    "syllabus_extracted.csv": "silabo",
+    "promos_clean.csv": "promo_lista",
+    "deportes_clean.csv": "deporte_lista",
+    "organized_organizations.csv": "organizacion_lista",
+    "ofertas_empleo_chatbot.csv": "empleo_lista",
+}
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description="Benchmark offline de MindTEC")
+    parser.add_argument("--requests", type=int, default=200, help="mensajes enviados a /hook")
+    parser.add_argument("--concurrency", type=int, default=16, help="usuarios simultáneos")
+    parser.add_argument("--answer-requests", type=int, default=50, help="llamadas directas a getAnswer")
+    parser.add_argument("--load-repeats", type=int, default=5, help="repeticiones de loadAndSplitData")
+    parser.add_argument("--llm-first-token-ms", type=float, default=300.0)
+    parser.add_argument("--llm-per-token-ms", type=float, default=10.0)
+    parser.add_argument("--llm-tokens", type=int, default=120)
+    parser.add_argument("--twilio-latency-ms", type=float, default=50.0)
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0, help="latencia fija por llamada al encoder falso")
+    parser.add_argument("--embed-per-item-ms", type=float, default=0.0, help="latencia por texto del encoder falso")
+    parser.add_argument("--real-embeddings", action="store_true", help="usa el modelo HuggingFace real")
+    parser.add_argument("--vector-backend", choices=["local", "qdrant-memory"], default="local")
+    parser.add_argument("--disable-answer-cache", action="store_true")
+    parser.add_argument("--no-stream", action="store_true", help="envía cada respuesta en un solo mensaje")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="archivo JSON de salida (por defecto stdout)")
+    return parser.parse_args()
+
+def configureEnvironment(args, work_dir):
+    # La configuración se lee al importar app.config: debe fijarse antes
+    os.environ.update({
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "sk-benchmark"),
+        "TWILIO_ACCOUNT_SID": os.environ.get("TWILIO_ACCOUNT_SID", "ACbenchmark"),
+        "TWILIO_AUTH_TOKEN": os.environ.get("TWILIO_AUTH_TOKEN", "benchmark"),
+        "QDRANT_COLLECTION_NAME": "benchmark",
+        "VECTOR_BACKEND": "local" if args.vector_backend == "local" else "qdrant",
+        "LOCAL_INDEX_PATH": os.path.join(work_dir, "vector_index"),
+        "INDEX_LOCK_PATH": os.path.join(work_dir, "index.lock"),
+        "INDEX_VERSION_PATH": os.path.join(work_dir, "index_version.json"),
+        "EMBEDDING_CACHE_DIR": "",
+        "INDEX_SYNC_MODE": "rebuild",
+        "SELF_TEST_MODE": "off",
+        "HISTORY_BACKEND": "memory",
+        "STREAM_RESPONSES": "false" if args.no_stream else "true",
+    })
+    if not args.real_embeddings:
+        # Los vectores falsos no guardan similitud semántica: sin umbral de score
+        os.environ["CONTEXT_MIN_SCORE"] = "-1"
+    if args.disable_answer_cache:
+        os.environ["ANSWER_CACHE_SIZE"] = "0"
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+    return {
+        "count": len(ordered),
+        "mean_ms": 1000.0 * statistics.fmean(ordered),
+        "p50_ms": 1000.0 * pick(0.50),
+        "p95_ms": 1000.0 * pick(0.95),
+        "p99_ms": 1000.0 * pick(0.99),
+        "max_ms": 1000.0 * ordered[-1],
+    }
+
+def readRows(path):
+    from app.utils.data_loader import getSchema
+    with open(path, "r", encoding=getSchema(path).encoding) as f:
+        return list(csv.DictReader(f))
+
+def templateQuestions(templates_by_file):
+    # (pregunta, intención esperada) por cada fila de cada CSV
+    pool = []
+    for path in DATA_PATHS:
+        name = os.path.basename(path)
+        column = QUESTION_TEMPLATES[name][0]
+        for row in readRows(path):
+            value = (row.get(column) or "").strip()
+            if value:
+                pool.extend((template.format(value), INTENT_LABELS[name]) for template in templates_by_file[name])
+    return pool
+
+def routingQuestions():
+    from app.models.intent_router import INTENTS
+    from app.utils.answer_cache import normalizeQuestion
+    examples = {normalizeQuestion(example) for intent in INTENTS for example in intent.examples}
+    pool = ROUTING_GENERIC + templateQuestions(ROUTING_TEMPLATES)
+    return [(question, intent) for question, intent in pool if normalizeQuestion(question) not in examples]
+
+def buildQuestions(count, rng):
+    templates = {name: templates for name, (_, templates) in QUESTION_TEMPLATES.items()}
+    pool = GENERIC_QUESTIONS + [question for question, _ in templateQuestions(templates)]
+    return [rng.choice(pool) for _ in range(count)]
+
+def peakRssMb():
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+def installFakes(args, fakes):
+    import app.models.qa_model as qa_model
+    from benchmarks.fakes import FakeEmbeddings, FakeLLM
+
+    if not args.real_embeddings:
+        def embeddingsFactory(model_name=None, **kwargs):
+            embeddings = FakeEmbeddings(model_name, latency_ms=args.embed_latency_ms, per_item_ms=args.embed_per_item_ms)
+            fakes["embeddings"] = embeddings
+            return embeddings
+        qa_model.createEmbeddings = embeddingsFactory
+
+    def llmFactory(**kwargs):
+        llm = FakeLLM(args.llm_first_token_ms, args.llm_per_token_ms, args.llm_tokens)
+        fakes["llm"] = llm
+        return llm
+    qa_model.ChatOpenAI = llmFactory
+
+    if args.vector_backend == "qdrant-memory":
+        from qdrant_client import QdrantClient
+        qa_model.QdrantClient = lambda url=None, api_key=None: QdrantClient(":memory:")
+
+def benchLoadData(args):
+    from app.utils.data_loader import loadAndSplitData
+    durations = []
+    chunks = 0
+    for _ in range(args.load_repeats):
+        started = time.perf_counter()
+        chunks = len(loadAndSplitData(DATA_PATHS))
+        durations.append(time.perf_counter() - started)
+    best = min(durations)
+    return {"chunks": chunks, "repeats": len(durations), "best_s": best, "chunks_per_s": chunks / best if best else 0.0}
+
+def benchIndexing():
+    from app.services.chatbot_service import ChatbotService
+    started = time.perf_counter()
+    service = ChatbotService(DATA_PATHS)
+    build_s = time.perf_counter() - started
+    chunks = len(service.qa_model.vector_store.list_ids())
+    return service, {"chunks": chunks, "build_s": build_s, "chunks_per_s": chunks / build_s if build_s else 0.0}
+
+def benchGetAnswer(service, questions):
+    latencies = []
+    started = time.perf_counter()
+    for question in questions:
+        call_started = time.perf_counter()
+        service.qa_model.getAnswer(question)
+        latencies.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+    result = percentiles(latencies)
+    result["requests_per_s"] = len(questions) / elapsed if elapsed else 0.0
+    return result
+
+def benchRouting(service):
+    # Precisión del enrutador sobre preguntas que no están entre los ejemplos de
+    # INTENTS y fracción que se respondería sin LLM; con vectores falsos solo
+    # mide el costo de clasificar
+    from app.config import config
+    qa_model = service.qa_model
+    router = qa_model.intent_router
+    if router is None:
+        return None
+    labeled = routingQuestions()
+    vectors = qa_model.embeddings.embed_documents([question for question, _ in labeled])
+    correct = fast = fast_correct = 0
+    latencies = []
+    for (question, expected), vector in zip(labeled, vectors):
+        started = time.perf_counter()
+        route = router.classify(vector)
+        latencies.append(time.perf_counter() - started)
+        hit = route.intent.name == expected
+        correct += hit
+        confident = route.score >= config.INTENT_FAST_PATH_THRESHOLD and route.margin >= config.INTENT_MIN_MARGIN
+        if confident and router.fast_rows(question, route.intent) is not None:
+            fast += 1
+            fast_correct += hit
+    return {
+        "questions": len(labeled),
+        "accuracy": correct / len(labeled),
+        "fast_path_rate": fast / len(labeled),
+        "fast_path_accuracy": fast_correct / fast if fast else None,
+        "classify": percentiles(latencies),
+    }
+
+async def benchHook(args, service, questions):
+    import httpx
+    import app.main as main
+    from benchmarks.fakes import FakeTwilio
+
+    twilio = FakeTwilio(args.twilio_latency_ms)
+    main.sendWhatsappMessageAsync = twilio.send
+    main.chatbot_service = service
+    main.startup_done.set()
+
+    first_reply = []
+    started_at = {}
+    pending = list(enumerate(questions))
+
+    async def user(client):
+        while pending:
+            index, question = pending.pop()
+            phone = f"whatsapp:+519{index:08d}"
+            reply = twilio.wait_for(phone)
+            started_at[phone] = time.perf_counter()
+            response = await client.post("/hook", data={"Body": question, "From": phone})
+            response.raise_for_status()
+            first_reply.append(await reply - started_at[phone])
+
+    await main.dispatcher.start()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(user(client) for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+    finally:
+        await main.dispatcher.stop()
+    # Después de stop(): incluye los mensajes que seguían en proceso tras la primera respuesta
+    queue_stats = main.dispatcher.stats()
+
+    last_reply = {}
+    for phone, _, sent_at in twilio.sent:
+        last_reply[phone] = max(last_reply.get(phone, 0.0), sent_at - started_at[phone])
+
+    return {
+        "concurrency": args.concurrency,
+        "requests_per_s": len(questions) / elapsed if elapsed else 0.0,
+        "first_reply": percentiles(first_reply),
+        "last_reply": percentiles(list(last_reply.values())),
+        "messages_sent": len(twilio.sent),
+        "queue": queue_stats,
+    }
+
+def main():
+    args = parseArgs()
+    rng = random.Random(args.seed)
+    work_dir = tempfile.mkdtemp(prefix="mindtec-bench-")
+    configureEnvironment(args, work_dir)
+    sys.path.insert(0, os.getcwd())
+
+    import logging
+    logging.disable(logging.INFO)
+
+    fakes = {}
+    installFakes(args, fakes)
+
+    report = {"args": vars(args)}
+    report["load_data"] = benchLoadData(args)
+    service, report["indexing"] = benchIndexing()
+    report["get_answer"] = benchGetAnswer(service, buildQuestions(args.answer_requests, rng))
+    report["hook"] = asyncio.run(benchHook(args, service, buildQuestions(args.requests, rng)))
+    if service.qa_model.answer_cache:
+        report["answer_cache"] = service.qa_model.answer_cache.stats()
+    if service.qa_model.single_flight:
+        report["single_flight"] = service.qa_model.single_flight.stats()
+    if service.qa_model.intent_router:
+        report["intents"] = service.qa_model.intent_stats()
+    report["routing"] = benchRouting(service)
+    report["llm_calls"] = fakes["llm"].calls
+    report["peak_rss_mb"] = peakRssMb()
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
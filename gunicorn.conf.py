@@ -0,0 +1,20 @@
+import os
+
+# Despliegue con varios workers:
+#
+#   gunicorn -c gunicorn.conf.py app.main:app
+#
+# preload_app importa la app en el proceso maestro antes del fork: con
+# PRELOAD_MODEL el modelo de embeddings se carga una sola vez y los workers
+# comparten sus pesos con copia en escritura. Cada worker construye su servicio
+# al arrancar; la sincronización del índice está protegida por un lock de
+# archivo, así que solo un worker embebe y escribe, y los demás esperan a que
+# el índice esté listo (GET /readyz responde 503 mientras tanto).
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+
+os.environ.setdefault("PRELOAD_MODEL", "true")
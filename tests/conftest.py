@@ -0,0 +1,5 @@
+import os
+
+# app.services crea el cliente de Twilio al importarse; las pruebas no envían mensajes
+os.environ.setdefault("TWILIO_ACCOUNT_SID", "ACtest")
+os.environ.setdefault("TWILIO_AUTH_TOKEN", "test")
@@ -0,0 +1,94 @@
+import pytest
+from app.utils import answer_cache
+from app.utils.answer_cache import ANY_SCOPE, AnswerCache, normalizeQuestion
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(answer_cache.time, "monotonic", clock)
+    return clock
+
+def test_normalize_question():
+    assert normalizeQuestion("  ¿Qué DEPORTES hay?  ") == "que deportes hay"
+
+def test_exact_hit_ignores_case_and_punctuation():
+    cache = AnswerCache(max_entries=10)
+    cache.put("all", "¿Qué deportes hay?", [1.0, 0.0], "respuesta")
+    assert cache.get_exact("all", "que deportes hay") == "respuesta"
+    assert cache.get_exact("otro", "que deportes hay") is None
+
+def test_lru_eviction_keeps_recently_used():
+    cache = AnswerCache(max_entries=2)
+    cache.put("all", "pregunta uno", [1.0, 0.0], "a")
+    cache.put("all", "pregunta dos", [0.0, 1.0], "b")
+    cache.get_exact("all", "pregunta uno")
+    cache.put("all", "pregunta tres", [1.0, 1.0], "c")
+    assert cache.get_exact("all", "pregunta dos") is None
+    assert cache.get_exact("all", "pregunta uno") == "a"
+    assert cache.get_exact("all", "pregunta tres") == "c"
+    assert cache.stats()["entries"] == 2
+
+def test_ttl_expiry(clock):
+    cache = AnswerCache(max_entries=10, ttl_seconds=60)
+    cache.put("all", "pregunta uno", [1.0, 0.0], "a")
+    clock.now += 61
+    assert cache.get_exact("all", "pregunta uno") is None
+    assert cache.get_similar("all", "pregunta uno", [1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+def test_expired_entries_are_purged_on_put(clock):
+    cache = AnswerCache(max_entries=10, ttl_seconds=60)
+    cache.put("all", "pregunta uno", [1.0, 0.0], "a")
+    clock.now += 61
+    cache.put("all", "pregunta dos", [0.0, 1.0], "b")
+    assert cache.stats()["entries"] == 1
+
+def test_semantic_threshold():
+    cache = AnswerCache(max_entries=10, similarity_threshold=0.95)
+    cache.put("all", "como reservo una cancha", [1.0, 0.0], "reserva")
+    assert cache.get_similar("all", "como puedo reservar cancha", [0.99, 0.05]) == "reserva"
+    assert cache.get_similar("all", "que promociones hay", [0.7, 0.7]) is None
+    assert cache.get_similar("otro", "como puedo reservar cancha", [0.99, 0.05]) is None
+
+def test_semantic_hit_requires_same_entities():
+    cache = AnswerCache(max_entries=10, similarity_threshold=0.9, entity_terms=["Johny Rockets", "Pejerrey Point"])
+    cache.put("all", "¿Qué descuento hay en Johny Rockets?", [1.0, 0.0], "johny")
+    assert cache.get_similar("all", "¿Qué descuento hay en Pejerrey Point?", [1.0, 0.0]) is None
+    assert cache.get_similar("all", "descuentos en johny rockets", [1.0, 0.0]) == "johny"
+    assert cache.stats()["entity_mismatches"] == 1
+
+def test_semantic_hit_requires_same_codes():
+    cache = AnswerCache(max_entries=10, similarity_threshold=0.9)
+    cache.put("all", "creditos del curso CS1111", [1.0, 0.0], "cs1111")
+    assert cache.get_similar("all", "creditos del curso CS1112", [1.0, 0.0]) is None
+
+def test_corpus_version_change_clears_entries():
+    cache = AnswerCache(max_entries=10)
+    cache.set_corpus_version("v1")
+    cache.put("all", "pregunta uno", [1.0, 0.0], "a")
+    cache.set_corpus_version("v2")
+    assert cache.get_exact("all", "pregunta uno") is None
+    cache.put("all", "pregunta uno", [1.0, 0.0], "b")
+    assert cache.get_similar("all", "pregunta uno", [1.0, 0.0]) == "b"
+
+def test_any_scope_finds_exact_question_in_its_scope():
+    cache = AnswerCache(max_entries=10)
+    cache.put("promo", "¿Qué promociones hay?", [1.0, 0.0], "promos")
+    assert cache.get_exact(ANY_SCOPE, "que promociones hay") == "promos"
+    assert cache.get_exact("all", "que promociones hay") is None
+    assert cache.get_similar("all", "que promociones hay", [1.0, 0.0]) is None
+    assert cache.get_similar("promo", "que promociones hay", [1.0, 0.0]) == "promos"
+
+def test_any_scope_forgets_evicted_entries():
+    cache = AnswerCache(max_entries=1)
+    cache.put("promo", "pregunta uno", [1.0, 0.0], "a")
+    cache.put("deporte", "pregunta dos", [0.0, 1.0], "b")
+    assert cache.get_exact(ANY_SCOPE, "pregunta uno") is None
+    assert cache.get_exact(ANY_SCOPE, "pregunta dos") == "b"
@@ -0,0 +1,57 @@
+from types import SimpleNamespace
+from app.models.context_builder import ContextBuilder
+
+def makeHit(text, doc_type="syllabus"):
+    return SimpleNamespace(payload={"text": text, "doc_type": doc_type})
+
+def makeBuilder(token_budget):
+    # Codificación inexistente: se usa la estimación de 4 caracteres por token
+    return ContextBuilder(token_budget, encoding_name="sin-codificacion", min_part_tokens=8)
+
+def syllabusRow(name, field_chars=400):
+    return "\n".join([
+        f"Curso: {name}",
+        f"Temas: {'t' * field_chars}",
+        f"Referencias Bibliográficas: Libro de {name}",
+    ])
+
+def test_all_documents_fit_within_budget():
+    builder = makeBuilder(10000)
+    context, stats = builder.build([makeHit(syllabusRow("A")), makeHit(syllabusRow("B"))])
+    assert stats["documents"] == 2
+    assert stats["trimmed"] == 0
+    assert "Libro de A" in context and "Libro de B" in context
+
+def test_duplicate_texts_are_dropped():
+    builder = makeBuilder(10000)
+    _, stats = builder.build([makeHit("mismo texto"), makeHit("mismo texto"), makeHit("otro texto")])
+    assert stats["hits"] == 3
+    assert stats["documents"] == 2
+
+def test_overflowing_document_keeps_fields_that_fit():
+    first = syllabusRow("A")
+    budget = makeBuilder(0).count_tokens(first) + 60
+    builder = makeBuilder(budget)
+    context, stats = builder.build([makeHit(first), makeHit(syllabusRow("B"))])
+    assert stats["documents"] == 2
+    assert stats["trimmed"] == 1
+    # Se omite el campo largo, no las referencias del final
+    assert "Libro de B" in context
+    assert context.count("Temas:") == 1
+    assert stats["tokens"] <= budget
+
+def test_later_short_documents_still_fit():
+    builder = makeBuilder(makeBuilder(0).count_tokens(syllabusRow("A")) + 20)
+    context, stats = builder.build([
+        makeHit(syllabusRow("A")),
+        makeHit("Temas: " + "x" * 2000),
+        makeHit("Lugar: Cine", doc_type="promo"),
+    ])
+    assert "Lugar: Cine" in context
+    assert "x" * 100 not in context
+    assert stats["tokens"] <= builder.token_budget
+
+def test_empty_hits():
+    context, stats = makeBuilder(100).build([])
+    assert context == ""
+    assert stats == {"hits": 0, "documents": 0, "trimmed": 0, "tokens": 0}
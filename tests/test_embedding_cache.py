@@ -0,0 +1,57 @@
+import numpy as np
+from app.utils.embedding_cache import CachedEmbeddings, EmbeddingCache, textKey
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [[float(len(text)), 1.0, 0.0] for text in texts]
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [float(len(text)), 0.0, 1.0]
+
+def test_documents_persist_across_instances(tmp_path):
+    inner = CountingEmbeddings()
+    CachedEmbeddings(inner, EmbeddingCache(str(tmp_path), "modelo", "float32")).embed_documents(["a", "bb"])
+    reopened = CachedEmbeddings(inner, EmbeddingCache(str(tmp_path), "modelo", "float32"))
+    assert reopened.embed_documents(["bb", "a"]) == [[2.0, 1.0, 0.0], [1.0, 1.0, 0.0]]
+    assert inner.calls == 1
+
+def test_queries_stay_in_memory(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "modelo", "float32")
+    embeddings = CachedEmbeddings(CountingEmbeddings(), cache, query_cache_size=2)
+    for question in ["uno", "dos", "uno", "tres", "dos"]:
+        embeddings.embed_query(question)
+    assert cache.rows == 0
+    stats = embeddings.query_stats()
+    assert stats["entries"] == 2
+    assert stats["hits"] == 1
+    assert stats["misses"] == 4
+
+def test_model_change_discards_entries(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "modelo", "float32")
+    cache.put_many(["k"], [[1.0, 2.0]])
+    assert EmbeddingCache(str(tmp_path), "otro-modelo", "float32").rows == 0
+
+def test_compaction_keeps_newest_rows(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "modelo", "float32", max_entries=8)
+    other = EmbeddingCache(str(tmp_path), "modelo", "float32", max_entries=8)
+    for i in range(10):
+        cache.put_many([textKey(str(i))], [[float(i), 0.0]])
+    assert cache.compactions == 1
+    assert cache.rows <= 8
+    found = cache.get_many([textKey("9"), textKey("0")])
+    assert textKey("0") not in found
+    np.testing.assert_array_equal(found[textKey("9")], [9.0, 0.0])
+
+    # Una instancia abierta antes de compactar pasa a la nueva generación
+    assert textKey("9") in other.get_many([textKey("9")])
+    assert other.generation == cache.generation
+
+    # Otro proceso abre la nueva generación y los archivos viejos ya no están
+    reopened = EmbeddingCache(str(tmp_path), "modelo", "float32", max_entries=8)
+    assert reopened.rows == cache.rows
+    assert sorted(name for name in (tmp_path).iterdir() if name.name.startswith("keys")) == [tmp_path / "keys.1.txt"]
@@ -0,0 +1,79 @@
+import pytest
+from app.services import history_store
+from app.services.history_store import MemoryHistoryStore, SqliteHistoryStore
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(history_store.time, "monotonic", clock)
+    monkeypatch.setattr(history_store.time, "time", clock)
+    return clock
+
+def turns(count):
+    return [(f"pregunta {i}", f"respuesta {i}") for i in range(count)]
+
+def fill(store, phone, count):
+    for message, answer in turns(count):
+        store.append(phone, message, answer)
+
+def test_memory_keeps_last_max_turns_in_order():
+    store = MemoryHistoryStore(max_turns=10, recent_turns=3, block_turns=4)
+    fill(store, "a", 25)
+    assert store.get("a") == turns(25)[-10:]
+    assert store.stats()["turns"] == 10
+
+def test_memory_archive_rewrites_only_the_last_block():
+    store = MemoryHistoryStore(max_turns=20, recent_turns=2, block_turns=4)
+    fill(store, "a", 12)
+    blocks = store.users["a"]["blocks"]
+    assert [count for _, count in blocks] == [4, 4, 2]
+    first = blocks[0][0]
+    store.append("a", "nueva", "respuesta")
+    assert store.users["a"]["blocks"][0][0] is first
+
+def test_memory_recent_turns_clamped_to_max_turns():
+    store = MemoryHistoryStore(max_turns=3, recent_turns=10)
+    assert store.recent_turns == 3
+    fill(store, "a", 5)
+    assert store.get("a") == turns(5)[-3:]
+
+def test_memory_evicts_least_recent_user():
+    store = MemoryHistoryStore(max_users=2)
+    fill(store, "a", 1)
+    fill(store, "b", 1)
+    fill(store, "a", 1)
+    fill(store, "c", 1)
+    assert store.get("b") == []
+    assert store.get("a") and store.get("c")
+    assert store.stats()["evicted_users"] == 1
+
+def test_memory_evicts_idle_users(clock):
+    store = MemoryHistoryStore(idle_ttl=100)
+    fill(store, "a", 1)
+    clock.now += 200
+    fill(store, "b", 1)
+    assert store.get("a") == []
+    assert store.stats()["evicted_users"] == 1
+
+def test_sqlite_caps_turns_and_users(tmp_path, clock):
+    store = SqliteHistoryStore(str(tmp_path / "history.sqlite3"), max_turns=5, max_users=2, idle_ttl=0)
+    fill(store, "a", 8)
+    assert store.get("a") == turns(8)[-5:]
+    clock.now += 1
+    fill(store, "b", 1)
+    clock.now += 1
+    fill(store, "c", 1)
+    # El límite de usuarios se aplica en el barrido, como mucho una vez por minuto
+    clock.now += 60
+    fill(store, "c", 1)
+    assert store.get("a") == []
+    stats = store.stats()
+    assert stats["users"] == 2
+    assert stats["evicted_users"] == 1
@@ -0,0 +1,51 @@
+import pytest
+
+qa_model = pytest.importorskip("app.models.qa_model")
+QAModel = qa_model.QAModel
+
+class CountingStore:
+    def __init__(self, points):
+        self.points = points
+
+    def count(self):
+        return self.points
+
+def makeModel(points):
+    model = QAModel.__new__(QAModel)
+    model.vector_store = CountingStore(points)
+    return model
+
+@pytest.fixture
+def deploy(monkeypatch):
+    def setDeploy(deploy_id="", started_at=1000.0):
+        monkeypatch.setattr(qa_model.config, "INDEX_DEPLOY_ID", deploy_id)
+        monkeypatch.setattr(qa_model.config, "STARTED_AT", started_at)
+    setDeploy()
+    return setDeploy
+
+def test_source_version_depends_on_data_and_deploy(deploy):
+    version = QAModel.source_version("datos")
+    assert version == QAModel.source_version("datos")
+    assert version != QAModel.source_version("otros datos")
+    deploy("v2")
+    assert version != QAModel.source_version("datos")
+    assert QAModel.source_version(None) is None
+
+def test_rebuild_once_per_declared_deploy(deploy):
+    deploy("v1", started_at=5000.0)
+    assert QAModel.rebuilt_in_deploy({"deploy_id": "v1", "updated_at": 1.0})
+    assert not QAModel.rebuilt_in_deploy({"deploy_id": "v0", "updated_at": 9999.0})
+    assert not QAModel.rebuilt_in_deploy(None)
+
+def test_rebuild_once_since_master_start_without_deploy_id(deploy):
+    deploy("", started_at=5000.0)
+    assert QAModel.rebuilt_in_deploy({"deploy_id": "", "updated_at": 5001.0})
+    assert not QAModel.rebuilt_in_deploy({"deploy_id": "", "updated_at": 4999.0})
+
+def test_index_is_current_requires_same_source_and_points(deploy):
+    marker = {"corpus_version": "abc", "points": 90, "source_version": QAModel.source_version("datos")}
+    assert makeModel(90).index_is_current(marker, QAModel.source_version("datos"))
+    assert not makeModel(90).index_is_current(marker, QAModel.source_version("otros datos"))
+    assert not makeModel(0).index_is_current(marker, QAModel.source_version("datos"))
+    assert not makeModel(90).index_is_current(None, QAModel.source_version("datos"))
+    assert not makeModel(90).index_is_current(marker, None)
@@ -0,0 +1,49 @@
+from app.models.intent_router import INTENTS, IntentRouter, isListingRequest
+
+PROMO = next(intent for intent in INTENTS if intent.name == "promo_lista")
+SILABO = next(intent for intent in INTENTS if intent.name == "silabo")
+
+def promoRow(place):
+    return {"Lugar": place, "Titulo": f"Descuento en {place}", "Descripción": "10% con carnet"}
+
+def buildRouter(max_items=15):
+    rows = {"promo": [promoRow(place) for place in ("Bembos", "Starbucks", "Cineplanet", "Papa John's")]}
+    return IntentRouter(None, rows=rows, max_items=max_items)
+
+def test_listing_requests():
+    assert isListingRequest("¿Qué promociones hay para estudiantes?")
+    assert isListingRequest("Lista de descuentos")
+    assert isListingRequest("¿Cuáles son los beneficios?")
+    assert not isListingRequest("¿Hasta cuándo vale el descuento?")
+
+def test_mentioned_entity_filters_rows():
+    rows, filtered, omitted = buildRouter().fast_rows("¿Qué descuento tiene Starbucks?", PROMO)
+    assert filtered
+    assert [row["Lugar"] for row in rows] == ["Starbucks"]
+
+def test_no_entity_and_no_listing_falls_back_to_llm():
+    router = buildRouter()
+    assert router.fast_rows("¿Hasta cuándo vale el descuento?", PROMO) is None
+    assert router.fast_answer("¿Hasta cuándo vale el descuento?", PROMO) is None
+    assert router.stats()["declined"] == 1
+
+def test_unfiltered_listing_is_capped():
+    rows, filtered, omitted = buildRouter(max_items=2).fast_rows("¿Qué promociones hay?", PROMO)
+    assert not filtered
+    assert len(rows) == 2
+    assert omitted == 2
+
+def test_capped_answer_says_it_was_truncated():
+    answer = buildRouter(max_items=3).fast_answer("¿Qué promociones hay?", PROMO)
+    assert "Papa John's" not in answer
+    assert "y 1 más" in answer
+
+def test_answer_within_cap_lists_everything():
+    answer = buildRouter().fast_answer("¿Qué promociones hay?", PROMO)
+    assert all(place in answer for place in ("Bembos", "Starbucks", "Cineplanet", "Papa John's"))
+    assert "más." not in answer
+
+def test_intent_without_fast_path():
+    router = buildRouter()
+    assert router.fast_answer("¿Qué cursos hay?", SILABO) is None
+    assert router.stats()["declined"] == 0
@@ -0,0 +1,57 @@
+from app.models.lexical_index import BM25Index, reciprocalRankFusion, tokenize
+from app.models.vector_store import SearchHit
+
+DOCUMENTS = [
+    ("futbol", "Deporte: Fútbol. Reserva de canchas de fútbol en el campus.", "deporte"),
+    ("basquet", "Deporte: Básquet. Reserva la cancha de básquet por una hora.", "deporte"),
+    ("bembos", "Lugar: Bembos. Descuento en hamburguesas para estudiantes.", "promo"),
+    ("marketing", "Curso: Fundamentos de Marketing. Créditos: 4. Evaluación continua.", "syllabus"),
+]
+
+def buildIndex():
+    index = BM25Index()
+    index.build(
+        [point_id for point_id, _, _ in DOCUMENTS],
+        [text for _, text, _ in DOCUMENTS],
+        [{"doc_type": doc_type, "text": text} for _, text, doc_type in DOCUMENTS],
+    )
+    return index
+
+def hit(point_id):
+    return SearchHit(point_id, 1.0, {"id": point_id})
+
+def test_tokenize_folds_accents_plurals_and_stopwords():
+    assert tokenize("¿Dónde están las canchas de Fútbol?") == ["cancha", "futbol"]
+
+def test_bm25_ranks_documents_with_more_matching_terms_first():
+    results = buildIndex().search("reserva de cancha de fútbol", limit=4)
+    assert [result.id for result in results][:2] == ["futbol", "basquet"]
+    assert results[0].score > results[1].score
+
+def test_bm25_rare_terms_weigh_more():
+    # "bembos" aparece en un solo documento y "reserva" en dos
+    results = buildIndex().search("reserva bembos", limit=4)
+    assert results[0].id == "bembos"
+
+def test_bm25_doc_type_filter_and_no_matches():
+    index = buildIndex()
+    assert [result.id for result in index.search("reserva cancha", doc_type="promo")] == []
+    assert [result.id for result in index.search("créditos del curso", doc_type="syllabus")] == ["marketing"]
+    assert index.search("natación") == []
+    assert BM25Index().search("fútbol") == []
+
+def test_bm25_respects_limit():
+    assert len(buildIndex().search("reserva cancha fútbol básquet", limit=1)) == 1
+
+def test_rrf_rewards_documents_ranked_in_both_lists():
+    dense = [hit("a"), hit("b"), hit("c")]
+    lexical = [hit("b"), hit("d")]
+    fused = reciprocalRankFusion([dense, lexical], k=60, limit=4)
+    assert [result.id for result in fused] == ["b", "a", "d", "c"]
+    assert fused[0].score == 1.0 / 62 + 1.0 / 61
+
+def test_rrf_limit_and_payload():
+    fused = reciprocalRankFusion([[hit("a"), hit("b")], []], k=1, limit=1)
+    assert len(fused) == 1
+    assert fused[0].id == "a" and fused[0].payload == {"id": "a"}
+    assert fused[0].score == 0.5
@@ -0,0 +1,54 @@
+import asyncio
+from app.services.message_queue import MessageDispatcher
+
+def runDispatcher(handler, messages, num_workers=2, max_queue_size=10):
+    async def run():
+        dispatcher = MessageDispatcher(handler, num_workers=num_workers, max_queue_size=max_queue_size)
+        await dispatcher.start()
+        accepted = [dispatcher.enqueue(phone, body) for phone, body in messages]
+        await dispatcher.stop()
+        return dispatcher, accepted
+    return asyncio.run(run())
+
+def test_messages_from_one_user_stay_in_order():
+    handled = []
+
+    async def handler(phone, body):
+        await asyncio.sleep(0.01 if body == "a1" else 0)
+        handled.append((phone, body))
+
+    runDispatcher(handler, [("a", "a1"), ("a", "a2"), ("b", "b1"), ("a", "a3")])
+    assert [body for phone, body in handled if phone == "a"] == ["a1", "a2", "a3"]
+
+def test_slow_user_does_not_block_others():
+    handled = []
+
+    async def handler(phone, body):
+        if phone == "lento":
+            await asyncio.sleep(0.05)
+        handled.append(body)
+
+    # Con dos workers, los mensajes de "rapido" no esperan al usuario lento
+    runDispatcher(handler, [("lento", "l1"), ("lento", "l2"), ("rapido", "r1"), ("rapido", "r2")])
+    assert handled.index("r2") < handled.index("l1")
+
+def test_rejects_beyond_capacity():
+    async def handler(phone, body):
+        await asyncio.sleep(0)
+
+    dispatcher, accepted = runDispatcher(handler, [("a", str(i)) for i in range(5)], num_workers=1, max_queue_size=3)
+    assert accepted == [True, True, True, False, False]
+    stats = dispatcher.stats()
+    assert stats["processed"] == 3 and stats["rejected"] == 2 and stats["queue_depth"] == 0
+
+def test_handler_error_does_not_stall_the_user():
+    handled = []
+
+    async def handler(phone, body):
+        if body == "falla":
+            raise ValueError("error")
+        handled.append(body)
+
+    dispatcher, _ = runDispatcher(handler, [("a", "falla"), ("a", "ok")])
+    assert handled == ["ok"]
+    assert dispatcher.stats()["failed"] == 1
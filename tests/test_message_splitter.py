@@ -0,0 +1,39 @@
+from app.utils.message_splitter import SectionStream, cutPoint, splitMessage
+
+def test_short_message_is_not_split():
+    assert splitMessage("  Hola  ") == ["Hola"]
+    assert splitMessage("") == []
+
+def test_cut_prefers_paragraph_then_sentence_then_space():
+    assert cutPoint("uno dos\n\ntres. cuatro", 20) == len("uno dos\n\n")
+    assert cutPoint("uno dos. tres cuatro", 15) == len("uno dos. ")
+    assert cutPoint("uno dos tres", 10) == len("uno dos ")
+    assert cutPoint("x" * 30, 10) == 10
+
+def test_split_respects_limit_and_keeps_text():
+    text = "\n\n".join(f"Sección {i}. " + "palabra " * 40 for i in range(10))
+    parts = splitMessage(text, max_chars=200)
+    assert all(len(part) <= 200 for part in parts)
+    assert " ".join(" ".join(parts).split()) == " ".join(text.split())
+
+def test_split_word_longer_than_limit():
+    parts = splitMessage("a" * 25, max_chars=10)
+    assert parts == ["a" * 10, "a" * 10, "a" * 5]
+
+def test_stream_waits_for_min_chars_before_paragraph_cut():
+    stream = SectionStream(min_chars=20, max_chars=100)
+    assert stream.feed("Corto.\n\n") == []
+    sections = stream.feed("Un segundo párrafo algo más largo.\n\nSigue")
+    assert sections == ["Corto.\n\nUn segundo párrafo algo más largo."]
+    assert stream.flush() == ["Sigue"]
+    assert stream.flush() == []
+
+def test_stream_cuts_before_exceeding_max_chars():
+    stream = SectionStream(min_chars=300, max_chars=50)
+    sections = []
+    for word in ("palabra " * 30).split(" "):
+        sections.extend(stream.feed(word + " "))
+    sections.extend(stream.flush())
+    assert len(sections) > 1
+    assert all(len(section) <= 50 for section in sections)
+    assert " ".join(sections).split() == ["palabra"] * 30
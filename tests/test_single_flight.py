@@ -0,0 +1,99 @@
+import threading
+import pytest
+from app.utils.single_flight import SingleFlight
+
+def test_concurrent_calls_share_the_leader_result():
+    flight = SingleFlight(timeout=5)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "respuesta"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", compute)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("k", compute))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    while flight.stats()["coalesced"] < 3:
+        pass
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert results == ["respuesta"] * 4
+    assert len(calls) == 1
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 3, "timeouts": 0}
+
+def test_key_is_released_after_an_error():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("fallo")
+
+    with pytest.raises(ValueError):
+        flight.do("k", fail)
+    assert flight.stats()["in_flight"] == 0
+    assert flight.do("k", lambda: "ok") == "ok"
+
+def test_key_is_released_after_an_interrupt():
+    flight = SingleFlight()
+
+    def interrupt():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        flight.do("k", interrupt)
+    assert flight.stats()["in_flight"] == 0
+    assert flight.do("k", lambda: "ok") == "ok"
+
+def test_follower_error_after_leader_interrupt():
+    flight = SingleFlight(timeout=5)
+    started = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def interrupt():
+        started.set()
+        release.wait(5)
+        raise SystemExit
+
+    def runLeader():
+        try:
+            flight.do("k", interrupt)
+        except SystemExit:
+            pass
+
+    def runFollower():
+        try:
+            flight.do("k", lambda: "nunca")
+        except Exception as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=runLeader)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=runFollower)
+    follower.start()
+    while flight.stats()["coalesced"] < 1:
+        pass
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert len(errors) == 1 and isinstance(errors[0], RuntimeError)
+    assert flight.stats()["in_flight"] == 0
+
+def test_follower_computes_on_its_own_after_timeout():
+    flight = SingleFlight(timeout=0.05)
+    future, leader = flight.begin("k")
+    assert leader
+    assert flight.do("k", lambda: "propia") == "propia"
+    assert flight.stats()["timeouts"] == 1
+    flight.finish("k", future, result="tarde")
+    assert flight.stats()["in_flight"] == 0
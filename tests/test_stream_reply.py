@@ -0,0 +1,61 @@
+import asyncio
+import threading
+import time
+import pytest
+import app.main as main
+
+class FakeService:
+    # Genera secciones sin fin hasta que se cierra el generador
+    def __init__(self):
+        self.produced = 0
+        self.closed = threading.Event()
+
+    def processMessageStream(self, from_phone, message):
+        try:
+            while True:
+                self.produced += 1
+                yield f"sección {self.produced}"
+                time.sleep(0.001)
+        finally:
+            self.closed.set()
+
+class FailingSender:
+    def __init__(self, fail_at):
+        self.fail_at = fail_at
+        self.sent = []
+
+    async def __call__(self, to_phone, body):
+        if len(self.sent) + 1 == self.fail_at:
+            raise ConnectionError("Twilio no disponible")
+        self.sent.append(body)
+
+@pytest.fixture
+def service(monkeypatch):
+    service = FakeService()
+    monkeypatch.setattr(main, "chatbot_service", service)
+    return service
+
+def test_failed_send_stops_generation_before_returning(monkeypatch, service):
+    sender = FailingSender(fail_at=2)
+    monkeypatch.setattr(main, "sendWhatsappMessageAsync", sender)
+    with pytest.raises(ConnectionError):
+        asyncio.run(main.streamReply("+51", "hola", time.perf_counter()))
+    # Al propagarse el error la generación ya terminó
+    assert service.closed.is_set()
+    produced = service.produced
+    time.sleep(0.05)
+    assert service.produced == produced
+    assert sender.sent == ["sección 1"]
+
+def test_generation_error_reaches_the_caller(monkeypatch):
+    class BrokenService:
+        def processMessageStream(self, from_phone, message):
+            yield "sección 1"
+            raise RuntimeError("fallo del LLM")
+
+    sender = FailingSender(fail_at=0)
+    monkeypatch.setattr(main, "chatbot_service", BrokenService())
+    monkeypatch.setattr(main, "sendWhatsappMessageAsync", sender)
+    with pytest.raises(RuntimeError):
+        asyncio.run(main.streamReply("+51", "hola", time.perf_counter()))
+    assert sender.sent == ["sección 1"]
@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+import pytest
+
+qa_model = pytest.importorskip("app.models.qa_model")
+QAModel = qa_model.QAModel
+
+class FlakyStore:
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+        self.points = []
+
+    def upsert(self, batch):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("Qdrant no disponible")
+        self.points.extend(batch)
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(qa_model.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(qa_model.config, "UPSERT_BATCH_SIZE", 10)
+
+def upsert(store, points):
+    QAModel.upsert_points(SimpleNamespace(vector_store=store), points)
+
+def test_retries_after_first_attempt(monkeypatch):
+    monkeypatch.setattr(qa_model.config, "UPSERT_MAX_RETRIES", 2)
+    store = FlakyStore(failures=2)
+    upsert(store, list(range(5)))
+    assert store.calls == 3
+    assert store.points == list(range(5))
+
+def test_error_after_last_retry(monkeypatch):
+    monkeypatch.setattr(qa_model.config, "UPSERT_MAX_RETRIES", 1)
+    store = FlakyStore(failures=2)
+    with pytest.raises(ConnectionError):
+        upsert(store, [1])
+    assert store.calls == 2
+
+@pytest.mark.parametrize("retries", [0, -1])
+def test_without_retries_batch_is_still_attempted(monkeypatch, retries):
+    monkeypatch.setattr(qa_model.config, "UPSERT_MAX_RETRIES", retries)
+    store = FlakyStore(failures=0)
+    upsert(store, [1, 2])
+    assert store.points == [1, 2]
+    failing = FlakyStore(failures=1)
+    with pytest.raises(ConnectionError):
+        upsert(failing, [1])
+    assert failing.calls == 1
@@ -0,0 +1,88 @@
+import math
+import os
+import numpy as np
+from qdrant_client import QdrantClient
+from app.models.vector_store import LocalVectorStore, QdrantVectorStore, VectorPoint
+
+def makePoint(point_id, vector, doc_type="promo"):
+    return VectorPoint(id=point_id, vector=vector, payload={"doc_type": doc_type, "text": point_id})
+
+def test_search_ranks_by_cosine_and_filters_doc_type(tmp_path):
+    store = LocalVectorStore(str(tmp_path), vector_size=2)
+    store.upsert([makePoint("a", [1.0, 0.0]), makePoint("b", [0.6, 0.8], "deporte"), makePoint("c", [0.0, 1.0])])
+    assert [hit.id for hit in store.search([1.0, 0.1], limit=2)] == ["a", "b"]
+    assert [hit.id for hit in store.search([1.0, 0.1], doc_type="deporte")] == ["b"]
+    assert store.search([1.0, 0.0], doc_type="empleo") == []
+
+def angle(i):
+    return [math.cos(i * math.pi / 2000), math.sin(i * math.pi / 2000)]
+
+def test_bulk_upsert_grows_capacity_and_keeps_rows(tmp_path):
+    store = LocalVectorStore(str(tmp_path), vector_size=2)
+    for start in range(0, 1000, 64):
+        store.upsert([makePoint(str(i), angle(i)) for i in range(start, min(start + 64, 1000))])
+    assert store.size == 1000
+    assert store.buffer.shape[0] >= 1000
+    assert store.search(angle(700), limit=1)[0].id == "700"
+    store.upsert([makePoint("5", [0.0, 1.0])])
+    assert store.size == 1000
+    assert store.search([0.0, 1.0], limit=1)[0].id == "5"
+
+def test_snapshot_view_survives_later_writes(tmp_path):
+    store = LocalVectorStore(str(tmp_path), vector_size=2)
+    store.upsert([makePoint("a", [1.0, 0.0])])
+    view = store.matrix
+    store.upsert([makePoint(str(i), [0.0, 1.0]) for i in range(600)])
+    np.testing.assert_array_equal(view, [[1.0, 0.0]])
+
+def test_delete(tmp_path):
+    store = LocalVectorStore(str(tmp_path), vector_size=2)
+    store.upsert([makePoint("a", [1.0, 0.0]), makePoint("b", [0.0, 1.0])])
+    store.delete(["a", "missing"])
+    assert store.list_ids() == {"b"}
+    assert [hit.id for hit in store.search([1.0, 0.0])] == ["b"]
+
+def test_save_and_load_single_snapshot(tmp_path):
+    store = LocalVectorStore(str(tmp_path), vector_size=2)
+    store.upsert([makePoint("a", [1.0, 0.0]), makePoint("b", [0.0, 1.0], "deporte")])
+    store.save()
+    assert sorted(os.listdir(tmp_path)) == ["index.npz"]
+
+    loaded = LocalVectorStore(str(tmp_path), vector_size=2)
+    assert loaded.list_ids() == {"a", "b"}
+    hit = loaded.search([0.0, 1.0], limit=1)[0]
+    assert (hit.id, hit.payload["doc_type"]) == ("b", "deporte")
+
+def test_corrupt_snapshot_is_ignored(tmp_path):
+    (tmp_path / "index.npz").write_bytes(b"no es un npz")
+    assert LocalVectorStore(str(tmp_path), vector_size=2).list_ids() == set()
+
+def test_snapshot_dimension_is_kept_on_load(tmp_path):
+    store = LocalVectorStore(str(tmp_path), vector_size=3)
+    store.upsert([makePoint("a", [1.0, 0.0, 0.0])])
+    store.save()
+    reloaded = LocalVectorStore(str(tmp_path))
+    assert reloaded.vector_size == 3
+    assert reloaded.search([1.0, 0.0, 0.0], limit=1)[0].id == "a"
+
+def test_new_embedding_dimension_resets_index(tmp_path):
+    store = LocalVectorStore(str(tmp_path), vector_size=3)
+    store.upsert([makePoint("viejo", [1.0, 0.0, 0.0])])
+    store.upsert([makePoint("nuevo", [0.0, 1.0])])
+    assert store.vector_size == 2
+    assert store.list_ids() == {"nuevo"}
+    store.delete(["viejo"])
+    assert store.search([0.0, 1.0], limit=1)[0].id == "nuevo"
+
+def test_qdrant_collection_is_recreated_for_new_dimension():
+    client = QdrantClient(":memory:")
+    store = QdrantVectorStore(client, "prueba", vector_size=3)
+    store.ensure_collection()
+    store.upsert([makePoint("00000000-0000-0000-0000-000000000001", [1.0, 0.0, 0.0])])
+
+    reopened = QdrantVectorStore(client, "prueba", vector_size=768)
+    reopened.ensure_collection()
+    assert reopened.vector_size == 3
+    reopened.upsert([makePoint("00000000-0000-0000-0000-000000000002", [0.0, 1.0])])
+    assert reopened.vector_size == 2
+    assert reopened.list_ids() == {"00000000-0000-0000-0000-000000000002"}